@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_environment():
+    from core.test_runner import test_environment
+
+    with test_environment():
+        yield
@@ -0,0 +1,75 @@
+"""
+Сериализация для API прямо из values(): из базы читаются только
+запрошенные колонки, а объекты моделей не создаются вовсе.
+"""
+from django.core.files.storage import default_storage
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class ValuesSerializer:
+    # Публичное имя поля -> путь в ORM для values().
+    fields = {}
+    # Поля, которые нужны всегда: ключ курсора и т.п.
+    required = ()
+    converters = {}
+
+    def __init__(self, requested=None):
+        if requested:
+            names = [name.strip() for name in requested.split(',')]
+            names = [name for name in names if name]
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise FieldsError(
+                    'Неизвестные поля: ' + ', '.join(unknown))
+        else:
+            names = list(self.fields)
+        self.names = names
+
+    def values(self, queryset):
+        paths = {self.fields[name] for name in self.names}
+        paths.update(self.required)
+        return queryset.values(*paths)
+
+    def to_dict(self, row):
+        data = {}
+        for name in self.names:
+            value = row[self.fields[name]]
+            converter = self.converters.get(name)
+            data[name] = converter(value) if converter else value
+        return data
+
+    def many(self, rows):
+        return [self.to_dict(row) for row in rows]
+
+
+class PostSerializer(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'text': 'text',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    }
+    required = ('id', 'pub_date')
+    converters = {'image': image_url}
+
+
+class CommentSerializer(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }
+    required = ('id', 'created')
@@ -0,0 +1,158 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(12)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Ленты отдают по 10 постов и ссылку на следующую страницу"""
+        urls = [
+            reverse('api:index'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile_posts', kwargs={'username': self.author}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.guest_client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertIsNone(data['previous'])
+                data = self.guest_client.get(data['next']).json()
+                self.assertEqual(len(data['results']), 2)
+                self.assertIsNone(data['next'])
+
+    def test_post_fields(self):
+        """Пост сериализуется целиком или только запрошенными полями"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        data = self.guest_client.get(url).json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['author'], self.author.username)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['comments_count'], 1)
+        self.assertIsNone(data['image'])
+        data = self.guest_client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_missing_objects(self):
+        """Несуществующие объекты дают 404 в JSON"""
+        urls = [
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:comments', kwargs={'post_id': 0}),
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
+
+    def test_etag(self):
+        """Неизменившийся ответ отдаётся как 304 по If-None-Match"""
+        url = reverse('api:index')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_feed_is_single_query(self):
+        """Страница ленты читается одним запросом без объектов моделей"""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(reverse('api:index'))
+        self.assertEqual(len(queries), 1)
+
+    def test_comments(self):
+        """Комментарии читаются всеми, а добавляются после входа"""
+        url = reverse('api:comments', kwargs={'post_id': self.post.pk})
+        data = self.guest_client.get(url).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']], ['Ок'])
+        response = self.guest_client.post(url, {'text': 'Гость'})
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.reader_client.post(
+            url, {'text': 'Новый'}, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], self.reader.username)
+        self.assertTrue(
+            Comment.objects.filter(post=self.post, text='Новый').exists())
+        response = self.reader_client.post(url, {'text': ''})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+
+    @override_settings(COMMENTS_FIRST_PAGE=1, COMMENTS_PAGE_SIZE=1)
+    def test_comments_pages(self):
+        """Комментарии листаются курсором тех же размеров, что и на сайте"""
+        Comment.objects.create(post=self.post, author=self.author, text='2')
+        url = reverse('api:comments', kwargs={'post_id': self.post.pk})
+        data = self.guest_client.get(url).json()
+        self.assertEqual([c['text'] for c in data['results']], ['2'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual([c['text'] for c in data['results']], ['Ок'])
+        self.assertIsNone(data['next'])
+
+    def test_follow_flow(self):
+        """Подписка, лента подписок и отписка"""
+        follow_url = reverse(
+            'api:profile_follow', kwargs={'username': self.author})
+        feed_url = reverse('api:follow_index')
+        self.assertEqual(
+            self.guest_client.get(feed_url).status_code,
+            HTTPStatus.UNAUTHORIZED
+        )
+        response = self.reader_client.post(follow_url)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        data = self.reader_client.get(feed_url, {'fields': 'id'}).json()
+        self.assertEqual(data['results'][0], {'id': self.post.pk})
+        profile = self.reader_client.get(reverse(
+            'api:profile', kwargs={'username': self.author})).json()
+        self.assertTrue(profile['following'])
+        self.assertEqual(profile['followers_count'], 1)
+        response = self.reader_client.delete(follow_url)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        data = self.reader_client.get(feed_url).json()
+        self.assertEqual(data['results'], [])
+        response = self.reader_client.delete(follow_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_method_not_allowed(self):
+        """Неподдерживаемый метод даёт 405"""
+        response = self.reader_client.post(reverse('api:index'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
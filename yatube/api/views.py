@@ -0,0 +1,216 @@
+"""
+JSON API для мобильных клиентов, версия 1.
+
+Авторизация та же, что и у сайта: сессия и CSRF-токен в заголовке
+X-CSRFToken для изменяющих запросов. Ленты листаются курсором из
+поля next/previous, набор полей задаётся параметром ?fields=.
+"""
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from core.paginator import CursorPaginator
+from posts.counters import get_stats
+from posts.forms import CommentForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.timeline import TimelinePaginator
+from posts.views import NUMBER_OF_POSTS, get_comments_page
+from .serializers import CommentSerializer, FieldsError, PostSerializer
+
+POST_ORDERING = ('-pub_date', '-id')
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def json_response(request, data, status=HTTPStatus.OK):
+    """JSON с ETag по содержимому: совпавший If-None-Match даёт 304."""
+    response = JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False})
+    if request.method in ('GET', 'HEAD') and status == HTTPStatus.OK:
+        set_response_etag(response)
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response)
+    return response
+
+
+def api_view(*methods):
+    """Допустимые методы и JSON вместо HTML-страниц ошибок."""
+    allowed = set(methods)
+    if 'GET' in allowed:
+        allowed.add('HEAD')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = error('Метод не поддерживается',
+                                 HTTPStatus.METHOD_NOT_ALLOWED)
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except FieldsError as exc:
+                return error(str(exc), HTTPStatus.BAD_REQUEST)
+            except Http404:
+                return error('Не найдено', HTTPStatus.NOT_FOUND)
+        return wrapper
+    return decorator
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Требуется авторизация', HTTPStatus.UNAUTHORIZED)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def request_data(request):
+    """Тело запроса: JSON от приложений или обычная форма."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def paginate(request, page, serializer):
+    return {
+        'results': serializer.many(page),
+        'next': page_url(request, page.paginator.next_cursor),
+        'previous': page_url(request, page.paginator.previous_cursor),
+    }
+
+
+def post_list(request, posts):
+    serializer = PostSerializer(request.GET.get('fields'))
+    pag = CursorPaginator(
+        serializer.values(posts), NUMBER_OF_POSTS, ordering=POST_ORDERING)
+    page = pag.get_page(request.GET.get('cursor'))
+    return json_response(request, paginate(request, page, serializer))
+
+
+@api_view('GET')
+def index(request):
+    return post_list(request, Post.objects.all())
+
+
+@api_view('GET')
+def group_posts(request, slug):
+    group_id = get_object_or_404(
+        Group.objects.values_list('pk', flat=True), slug=slug)
+    return post_list(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view('GET')
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    stats = get_stats(author)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        author=author, user=request.user).exists()
+    return json_response(request, {
+        'username': author.username,
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+        'following': following,
+    })
+
+
+@api_view('GET')
+def profile_posts(request, username):
+    author_id = get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username)
+    return post_list(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view('GET')
+@api_login_required
+def follow_index(request):
+    serializer = PostSerializer(request.GET.get('fields'))
+    pag = TimelinePaginator(
+        request.user, NUMBER_OF_POSTS,
+        posts=serializer.values(Post.objects.all()))
+    page = pag.get_page(request.GET.get('cursor'))
+    return json_response(request, paginate(request, page, serializer))
+
+
+@api_view('GET')
+def post_detail(request, post_id):
+    serializer = PostSerializer(request.GET.get('fields'))
+    row = serializer.values(Post.objects.filter(pk=post_id)).first()
+    if row is None:
+        raise Http404
+    return json_response(request, serializer.to_dict(row))
+
+
+@api_view('GET', 'POST')
+def comments(request, post_id):
+    if request.method == 'POST':
+        return add_comment(request, post_id)
+    serializer = CommentSerializer(request.GET.get('fields'))
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = get_comments_page(
+        serializer.values(Comment.objects.filter(post_id=post_id)),
+        request.GET.get('cursor'),
+    )
+    return json_response(request, paginate(request, page, serializer))
+
+
+@api_login_required
+@transaction.atomic
+def add_comment(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    form = CommentForm(request_data(request))
+    if not form.is_valid():
+        return JsonResponse(
+            {'errors': form.errors}, status=HTTPStatus.BAD_REQUEST)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    serializer = CommentSerializer()
+    row = serializer.values(Comment.objects.filter(pk=comment.pk)).get()
+    return json_response(
+        request, serializer.to_dict(row), status=HTTPStatus.CREATED)
+
+
+@api_view('POST', 'DELETE')
+@api_login_required
+@transaction.atomic
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        deleted = Follow.objects.filter(
+            user=request.user, author=author).delete()[0]
+        if not deleted:
+            raise Http404
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    if author == request.user:
+        return error('Нельзя подписаться на себя', HTTPStatus.BAD_REQUEST)
+    _, created = Follow.objects.get_or_create(
+        user=request.user, author=author)
+    return json_response(
+        request,
+        {'author': author.username, 'following': True},
+        status=HTTPStatus.CREATED if created else HTTPStatus.OK,
+    )
@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import QueuedTask
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'args',
+        'attempts',
+        'max_attempts',
+        'run_after',
+        'error'
+    )
+    search_fields = ('name', 'key')
+    list_filter = ('name',)
+    empty_value_display = '-пусто-'
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import db
+        connection_created.connect(
+            db.configure_sqlite, dispatch_uid='core.db.configure_sqlite')
@@ -0,0 +1,158 @@
+"""
+Переходник ASGI -> WSGI для Django 2.2, который сам умеет только WSGI.
+
+Соединения, чтение тела запроса и отправка ответа живут в цикле
+событий ASGI-сервера, а Django работает в ограниченном пуле потоков.
+Поток занят, только пока Django строит ответ: обычный ответ целиком
+собирается в потоке и уходит медленному клиенту уже без него. Потоковый
+ответ (StreamingHttpResponse) выдаётся в том же потоке, что его начал,
+потому что генератор может держать открытый курсор базы.
+"""
+import asyncio
+import io
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Тело запроса больше этого размера уходит из памяти во временный файл.
+SPOOL_SIZE = 1024 * 1024
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            raise ClientDisconnected
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return body
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        # Тело уже прочитано целиком, так что длина известна и для
+        # запросов с Transfer-Encoding: chunked.
+        'CONTENT_LENGTH': str(body.seek(0, io.SEEK_END)),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        if key in environ:
+            value = f'{environ[key]},{value}'
+        environ[key] = value
+    body.seek(0)
+    return environ
+
+
+def start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [
+            (name.lower().encode('latin1'), value.encode('latin1'))
+            for name, value in headers
+        ],
+    }
+
+
+class WsgiToAsgi:
+    """ASGI-приложение поверх WSGI-приложения и пула из threads потоков."""
+
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            threads or settings.ASGI_THREADS, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения: '
+                             f'{scope["type"]}')
+        try:
+            body = await read_body(receive)
+        except ClientDisconnected:
+            return
+        loop = asyncio.get_running_loop()
+        with body:
+            response = await loop.run_in_executor(
+                self.executor, self.respond,
+                build_environ(scope, body), loop, send)
+        if response is not None:
+            start, content = response
+            await send(start)
+            await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def respond(self, environ, loop, send):
+        """
+        Работает в потоке пула. Обычный ответ возвращает целиком,
+        потоковый сам отправляет по кускам и возвращает None.
+        """
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [start_message(status, headers)]
+
+        def send_now(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        iterable = self.wsgi_application(environ, start_response)
+        try:
+            if not getattr(iterable, 'streaming', False):
+                return started[0], b''.join(iterable)
+            send_now(started[0])
+            for chunk in iterable:
+                if chunk:
+                    send_now({'type': 'http.response.body', 'body': chunk,
+                              'more_body': True})
+            send_now({'type': 'http.response.body', 'body': b''})
+            return None
+        finally:
+            # close() шлёт request_finished: соединения с базой этого
+            # потока закрываются или остаются жить по CONN_MAX_AGE.
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
@@ -0,0 +1,54 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from core import metrics
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 0.05
+LOCK_ATTEMPTS = 20
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Значение из кэша с защитой от «набега» на пересчёт.
+
+    Вместе со значением хранится время его вычисления, и запись
+    пересчитывается чуть раньше срока с вероятностью, растущей к концу
+    жизни (probabilistic early expiration). Пересчитывает только тот
+    процесс, который взял блокировку; остальные отдают старое значение
+    или коротко ждут нового.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        early = delta * beta * math.log(1 - random.random())
+        if time.time() - early < expires_at:
+            return value
+        if not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+            return value
+        metrics.incr('cache_early_recomputes')
+        return _recompute(key, compute, timeout)
+
+    if cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        return _recompute(key, compute, timeout)
+    for _ in range(LOCK_ATTEMPTS):
+        time.sleep(LOCK_WAIT)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    metrics.incr('cache_lock_timeouts')
+    return compute()
+
+
+def _recompute(key, compute, timeout):
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+        return value
+    finally:
+        cache.delete(f'{key}:lock')
@@ -0,0 +1,62 @@
+"""
+Бэкенды кэша Django с подсчётом попаданий и промахов в core.metrics.
+
+В продакшене используется общий для всех процессов кэш (Redis или
+memcached), локально и в тестах — файловый или табличный.
+"""
+from django.core.cache.backends import db, filebased, locmem, memcached
+from django.core.cache.backends.base import BaseCache
+
+from core import metrics
+
+_MISSING = object()
+
+
+class MetricsMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            metrics.incr('cache_misses')
+            return default
+        metrics.incr('cache_hits')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        parent = super().get_many
+        if getattr(parent, '__func__', None) is BaseCache.get_many:
+            # Базовая реализация вызывает get() и уже посчитана им.
+            return parent(keys, version=version)
+        found = parent(keys, version=version)
+        metrics.incr('cache_hits', len(found))
+        metrics.incr('cache_misses', len(keys) - len(found))
+        return found
+
+
+class FileBasedCache(MetricsMixin, filebased.FileBasedCache):
+    pass
+
+
+class DatabaseCache(MetricsMixin, db.DatabaseCache):
+    pass
+
+
+class LocMemCache(MetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class MemcachedCache(MetricsMixin, memcached.MemcachedCache):
+    pass
+
+
+class PyLibMCCache(MetricsMixin, memcached.PyLibMCCache):
+    pass
+
+
+try:
+    from django_redis.cache import RedisCache as _RedisCache
+except ImportError:
+    pass
+else:
+    class RedisCache(MetricsMixin, _RedisCache):
+        pass
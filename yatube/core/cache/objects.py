@@ -0,0 +1,106 @@
+"""
+Кэш отдельных объектов моделей с чтением насквозь.
+
+ObjectCache хранит объекты под ключом id, а для полей из lookups —
+ещё и id под ключом значения поля (username, slug). get_many достаёт
+страницу объектов одним обращением к кэшу, а промахи — одним запросом
+IN. Объекты кладутся без связанных: их подставляет вызывающий код из
+кэшей соответствующих моделей, так что правка автора или группы видна
+во всех закэшированных постах.
+
+fields ограничивает кэш перечисленными полями: остальные не попадают
+в общий кэш (пароли пользователей) и при обращении читаются из базы.
+
+Промахи читаются из основной базы, а не с реплики: отстающая реплика
+положила бы в кэш старую строку на весь OBJECT_CACHE_TIMEOUT. Записи
+удаляются по сигналам post_save и post_delete после коммита, иначе
+параллельный запрос успел бы до коммита положить в кэш прежнюю версию.
+Изменения через QuerySet.update() сигналов не шлют: после них нужно
+вызвать delete().
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+
+from core import tasks
+
+
+class ObjectCache:
+    def __init__(self, model, lookups=(), prefix=None, fields=None):
+        self.model = model
+        self.lookups = tuple(lookups)
+        self.fields = tuple(fields) if fields is not None else None
+        self.prefix = prefix or model._meta.label_lower
+        for signal in (post_save, post_delete):
+            signal.connect(
+                self.invalidate, sender=model, weak=False,
+                dispatch_uid=f'object-cache:{self.prefix}')
+
+    def key(self, pk):
+        return f'{self.prefix}:{pk}'
+
+    def lookup_key(self, field, value):
+        # Значение может быть любым текстом, а memcached ждёт ASCII.
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'{self.prefix}:{field}:{digest}'
+
+    def queryset(self):
+        queryset = self.model._default_manager.using(DEFAULT_DB_ALIAS)
+        if self.fields is not None:
+            queryset = queryset.only(*self.fields)
+        return queryset
+
+    def get_many(self, ids):
+        """Словарь id -> объект; отсутствующих в базе id в нём нет."""
+        keys = {pk: self.key(pk) for pk in ids if pk is not None}
+        if not keys:
+            return {}
+        cached = cache.get_many(list(keys.values()))
+        found = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        missing = [pk for pk in keys if pk not in found]
+        if missing:
+            loaded = self.queryset().in_bulk(missing)
+            cache.set_many(
+                {keys[pk]: obj for pk, obj in loaded.items()},
+                settings.OBJECT_CACHE_TIMEOUT)
+            found.update(loaded)
+        return found
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def get_by(self, field, value):
+        """Объект по уникальному полю из lookups или None."""
+        key = self.lookup_key(field, value)
+        pk = cache.get(key)
+        if pk is not None:
+            obj = self.get(pk)
+            # Поле могли переименовать: старый ключ ведёт не туда.
+            if obj is not None and getattr(obj, field) == value:
+                return obj
+        obj = self.queryset().filter(**{field: value}).first()
+        if obj is None:
+            return None
+        cache.set_many({
+            key: obj.pk,
+            self.key(obj.pk): obj,
+        }, settings.OBJECT_CACHE_TIMEOUT)
+        return obj
+
+    def delete(self, pk):
+        if pk is not None:
+            cache.delete(self.key(pk))
+
+    def delete_many(self, ids):
+        if ids:
+            cache.delete_many([self.key(pk) for pk in ids])
+
+    def invalidate(self, sender, instance, **kwargs):
+        keys = [self.key(instance.pk)] + [
+            self.lookup_key(field, getattr(instance, field))
+            for field in self.lookups
+        ]
+        tasks.on_commit(lambda: cache.delete_many(keys))
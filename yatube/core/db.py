@@ -0,0 +1,111 @@
+"""
+Соединения с базой: настройка при открытии и маршрутизация на реплики.
+
+Представления, помеченные read_replica, читают с одной из реплик
+settings.REPLICA_DATABASES — одной и той же на весь запрос, чтобы
+страница не собиралась с реплик с разным отставанием. Всё остальное
+и любые записи идут в default. Пока запрос ничего не записал, роутер
+читает с реплики; после первой записи — уже с default.
+ReplicaMiddleware ставит автору записи cookie, и REPLICA_STICKY_SECONDS
+все его чтения идут в default, чтобы он сразу видел свой пост или
+комментарий, даже если реплика отстаёт.
+"""
+import contextlib
+import functools
+import random
+import threading
+
+from django.conf import settings
+
+_local = threading.local()
+# Записи в эти приложения не делают чтение «липким» (кэш в таблице).
+IGNORED_WRITES = ('django_cache',)
+# Сессии всегда читаются из default: свежий вход не должен теряться.
+PRIMARY_READS = ('sessions',)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет settings.SQLITE_PRAGMAS к новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def database_settings(connection):
+    """Фактические параметры соединения для отчётов бенчмарка."""
+    info = {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+    }
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in settings.SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                row = cursor.fetchone()
+                info[name] = row[0] if row else None
+    return info
+
+
+class Routing:
+    """Состояние маршрутизации текущего запроса."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = False
+        self.wrote = False
+        # Реплика запроса выбирается при первом чтении с реплики.
+        self.database = None
+
+
+@contextlib.contextmanager
+def routing(pinned=False):
+    previous = getattr(_local, 'routing', None)
+    _local.routing = Routing(pinned)
+    try:
+        yield _local.routing
+    finally:
+        _local.routing = previous
+
+
+def current_routing():
+    return getattr(_local, 'routing', None)
+
+
+def read_replica(view):
+    """Представление только читает, его запросы можно отдать реплике."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = current_routing()
+        if state is None or state.pinned:
+            return view(request, *args, **kwargs)
+        state.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = False
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_routing()
+        replicas = settings.REPLICA_DATABASES
+        if state is None or not state.replica or state.wrote or not replicas:
+            return None
+        if model._meta.app_label in PRIMARY_READS:
+            return None
+        if state.database not in replicas:
+            state.database = random.choice(replicas)
+        return state.database
+
+    def db_for_write(self, model, **hints):
+        state = current_routing()
+        if state is not None and model._meta.app_label not in IGNORED_WRITES:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default.
+        return True
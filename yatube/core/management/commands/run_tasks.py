@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе (TASKS_BACKEND=db)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить всё, что готово сейчас, и выйти')
+
+    def handle(self, *args, **options):
+        while True:
+            count = tasks.run_pending(options['batch_size'])
+            if count:
+                self.stdout.write(f'Выполнено задач: {count}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,121 @@
+"""
+Метрики процесса: простые счётчики и сводка по view.
+
+Счётчики увеличивает incr(). Если запрос обрабатывается внутри
+collect(), те же значения попадают и в метрики этого запроса: так
+попадания в кэш и время нарезки превью видны в Server-Timing и в
+медленном логе. observe() копит итоги запросов по имени view, а
+prometheus() отдаёт всё в текстовом формате Prometheus.
+"""
+import contextlib
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_views = {}
+_local = threading.local()
+
+# Границы корзин гистограммы длительности запросов, в секундах.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Что суммируется по каждому view помимо длительности.
+VIEW_FIELDS = (
+    'sql_queries',
+    'db_seconds',
+    'template_seconds',
+    'cache_hits',
+    'cache_misses',
+    'thumbnail_seconds',
+)
+
+
+def incr(name, value=1):
+    """Увеличивает счётчик процесса name на value."""
+    with _lock:
+        _counters[name] += value
+    current = getattr(_local, 'request', None)
+    if current is not None:
+        current[name] += value
+
+
+@contextlib.contextmanager
+def collect():
+    """Собирает incr() текущего потока в отдельный словарь запроса."""
+    previous = getattr(_local, 'request', None)
+    _local.request = defaultdict(float)
+    try:
+        yield _local.request
+    finally:
+        _local.request = previous
+
+
+def observe(view, duration, values):
+    """Добавляет завершённый запрос к сводке по view."""
+    with _lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = {
+                'requests': 0,
+                'duration_seconds': 0.0,
+                'buckets': [0] * (len(DURATION_BUCKETS) + 1),
+                **{field: 0.0 for field in VIEW_FIELDS},
+            }
+        stats['requests'] += 1
+        stats['duration_seconds'] += duration
+        stats['buckets'][bisect_left(DURATION_BUCKETS, duration)] += 1
+        for field in VIEW_FIELDS:
+            stats[field] += values.get(field, 0)
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
+
+
+def views_snapshot():
+    with _lock:
+        return {
+            view: dict(stats, buckets=list(stats['buckets']))
+            for view, stats in _views.items()
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _views.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus(prefix='yatube'):
+    """Все метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    for name, value in sorted(snapshot().items()):
+        lines.append(f'# TYPE {prefix}_{name}_total counter')
+        lines.append(f'{prefix}_{name}_total {value:g}')
+    views = sorted(views_snapshot().items())
+    if not views:
+        return '\n'.join(lines) + '\n'
+    metric = f'{prefix}_view_duration_seconds'
+    lines.append(f'# TYPE {metric} histogram')
+    for view, stats in views:
+        label = f'view="{_label(view)}"'
+        total = 0
+        for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+            total += count
+            lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {total}')
+        lines.append(
+            f'{metric}_bucket{{{label},le="+Inf"}} {stats["requests"]}')
+        lines.append(f'{metric}_sum{{{label}}} {stats["duration_seconds"]:g}')
+        lines.append(f'{metric}_count{{{label}}} {stats["requests"]}')
+    for field in VIEW_FIELDS:
+        metric = f'{prefix}_view_{field}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for view, stats in views:
+            lines.append(
+                f'{metric}{{view="{_label(view)}"}} {stats[field]:g}')
+    return '\n'.join(lines) + '\n'
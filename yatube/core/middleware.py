@@ -0,0 +1,117 @@
+import contextlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from core import db, metrics
+
+logger = logging.getLogger('core.requests')
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: число, время и текст SQL-запросов."""
+
+    def __init__(self, keep=None):
+        self.keep = keep or settings.SLOW_REQUEST_QUERIES
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.seconds += duration
+            self.queries.append((duration, sql))
+            if len(self.queries) > self.keep * 2:
+                # Храним только самые медленные запросы.
+                self.queries.sort(reverse=True)
+                del self.queries[self.keep:]
+
+    def slowest(self):
+        return sorted(self.queries, reverse=True)[:self.keep]
+
+
+def server_timing(values, duration):
+    ms = 1000
+    return ', '.join([
+        f'db;dur={values["db_seconds"] * ms:.1f};'
+        f'desc="SQL x{values["sql_queries"]:g}"',
+        f'tpl;dur={values["template_seconds"] * ms:.1f}',
+        f'cache;desc="hit {values["cache_hits"]:g} '
+        f'miss {values["cache_misses"]:g}"',
+        f'thumb;dur={values["thumbnail_seconds"] * ms:.1f}',
+        f'total;dur={duration * ms:.1f}',
+    ])
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает для каждого запроса SQL-запросы и время в базе, время
+    шаблонов, попадания в кэш и нарезку превью. Итоги копятся по имени
+    view для /metrics/, в DEBUG отдаются заголовком Server-Timing, а
+    запросы дольше SLOW_REQUEST_MS пишутся в лог с самыми медленными SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with metrics.collect() as values, contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        values['sql_queries'] = timer.count
+        values['db_seconds'] = timer.seconds
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, duration, values)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(values, duration)
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow(request, view, duration, values, timer)
+        return response
+
+    def log_slow(self, request, view, duration, values, timer):
+        queries = '\n'.join(
+            f'  {seconds * 1000:.1f} ms: {sql}'
+            for seconds, sql in timer.slowest()
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f ms, SQL x%d за %.0f ms, '
+            'шаблоны %.0f ms\n%s',
+            request.method, request.get_full_path(), view,
+            duration * 1000, timer.count, timer.seconds * 1000,
+            values['template_seconds'] * 1000, queries,
+        )
+
+
+class ReplicaMiddleware:
+    """
+    Включает маршрутизацию на реплики для запроса. Если запрос что-то
+    записал, ставит cookie, пока она жива — все чтения идут в default.
+    Стоит до SessionMiddleware, чтобы сохранение сессии тоже считалось.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = settings.REPLICA_COOKIE in request.COOKIES
+        with db.routing(pinned=pinned) as state:
+            response = self.get_response(request)
+        if state.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                settings.REPLICA_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
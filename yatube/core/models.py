@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class QueuedTask(models.Model):
+    """Задача в очереди в базе, её выполняет manage.py run_tasks."""
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    args = models.TextField(default='[]', verbose_name='Аргументы (JSON)')
+    # Пока задача с ключом ждёт выполнения, такая же не ставится.
+    key = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Всего попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Поставлена'
+    )
+    error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['run_after', 'id'],
+                name='task_run_after_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
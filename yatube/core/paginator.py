@@ -0,0 +1,181 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from core.cache import get_or_compute
+
+
+def encode_cursor(values, backwards=False):
+    payload = {'k': [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]}
+    if backwards:
+        payload['b'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (значения ключа, направление назад) или None."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode())
+        return list(payload['k']), bool(payload.get('b'))
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+def parse_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def keyset_filter(fields, values, backwards=False):
+    """
+    Условие «строго после values» для лексикографического порядка fields:
+    (a < x) OR (a = x AND b < y) для убывающих полей.
+    """
+    condition = Q()
+    for position, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending != backwards else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for prev_position, (prev_name, _) in enumerate(fields[:position]):
+            step &= Q(**{prev_name: values[prev_position]})
+        condition |= step
+    return condition
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу (pub_date, id) вместо OFFSET/COUNT.
+
+    Знает только, есть ли соседние страницы, поэтому выдаёт обычный
+    Page с номером 1 или 2 и числом страниц «текущая плюс следующая».
+    Переход вперёд и назад стоит одного запроса на любой глубине.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 cache_key=None, cache_timeout=None, hydrate=None):
+        super().__init__(object_list, per_page)
+        self.fields = parse_ordering(ordering)
+        # hydrate(ids) -> объекты в том же порядке: по индексу читаются
+        # только id, а сами объекты берутся, например, из кэша.
+        self.hydrate = hydrate
+        # Первую страницу можно держать в кэше под ключом cache_key; с
+        # hydrate в кэше лежат только id, а объекты собираются заново.
+        # Кэш наполняется из default: страница, собранная с отстающей
+        # реплики, прожила бы без свежих постов весь cache_timeout.
+        self.cache_key = cache_key
+        self.cache_timeout = cache_timeout
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.last_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    @property
+    def page_range(self):
+        return range(1, self._num_pages + 1)
+
+    def key(self, item):
+        if isinstance(item, dict):
+            # Строки из values(): ключ берётся по именам полей.
+            return [item[name] for name, _ in self.fields]
+        return [getattr(item, name) for name, _ in self.fields]
+
+    def to_python(self, values):
+        meta = self.object_list.model._meta
+        return [
+            (meta.pk if name == 'pk' else meta.get_field(name)).to_python(
+                value)
+            for (name, _), value in zip(self.fields, values)
+        ]
+
+    def fetch(self, values, backwards, limit):
+        """Первые limit объектов после values в заданном направлении."""
+        if self.hydrate is not None:
+            return self.hydrate(self.fetch_ids(values, backwards, limit))
+        return list(self.ordered(values, backwards)[:limit])
+
+    def fetch_ids(self, values, backwards, limit):
+        return list(self.ordered(values, backwards).values_list(
+            'pk', flat=True)[:limit])
+
+    def first_page(self, limit):
+        """Первая страница для кэша: id при hydrate, иначе объекты."""
+        queryset = self.ordered(None, False).using(DEFAULT_DB_ALIAS)
+        if self.hydrate is not None:
+            return list(queryset.values_list('pk', flat=True)[:limit])
+        return list(queryset[:limit])
+
+    def ordered(self, values, backwards):
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.fields, values, backwards))
+        order = [
+            ('-' if descending != backwards else '') + name
+            for name, descending in self.fields
+        ]
+        return queryset.order_by(*order)
+
+    def parse_cursor(self, cursor):
+        """Ключ и направление из курсора; битый курсор — первая страница."""
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return None, False
+        values, backwards = decoded
+        if not values:
+            # Пустой ключ с направлением назад: последняя страница.
+            return None, backwards
+        try:
+            if len(values) != len(self.fields):
+                raise ValueError
+            return self.to_python(values), backwards
+        except (ValueError, ValidationError):
+            return None, False
+
+    def get_page(self, cursor):
+        values, backwards = self.parse_cursor(cursor)
+        limit = self.per_page + 1
+        if values is None and not backwards and self.cache_key:
+            items = get_or_compute(
+                self.cache_key,
+                lambda: self.first_page(limit),
+                self.cache_timeout,
+            )
+            if self.hydrate is not None:
+                items = self.hydrate(items)
+        else:
+            items = self.fetch(values, backwards, limit)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+            has_previous, has_next = has_more, values is not None
+        else:
+            has_previous, has_next = values is not None, has_more
+        if items and has_next:
+            self.next_cursor = encode_cursor(self.key(items[-1]))
+        if items and has_previous:
+            self.previous_cursor = encode_cursor(
+                self.key(items[0]), backwards=True)
+        if has_next:
+            self.last_cursor = encode_cursor([], backwards=True)
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        return self._get_page(items, number, self)
+
+    def page(self, cursor):
+        return self.get_page(cursor)
@@ -0,0 +1,68 @@
+"""
+Стеммер Портера (Snowball) для русского языка.
+
+Нужен поиску по SQLite: в FTS5 нет русской морфологии, поэтому и
+тексты, и запросы индексируются уже приведёнными к основе словами.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+RV = re.compile(rf'^(.*?[{VOWELS}])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|'
+    r'ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL_REGION = re.compile(
+    rf'.*[^{VOWELS}]+[{VOWELS}].*ость?$')
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+TOKEN = re.compile(r'\w+')
+
+
+def _strip(pattern, word):
+    return pattern.sub('', word, count=1)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+    stripped = _strip(PERFECTIVE_GERUND, rv)
+    if stripped == rv:
+        rv = _strip(REFLEXIVE, rv)
+        stripped = _strip(ADJECTIVE, rv)
+        if stripped != rv:
+            rv = _strip(PARTICIPLE, stripped)
+        else:
+            stripped = _strip(VERB, rv)
+            rv = _strip(NOUN, rv) if stripped == rv else stripped
+    else:
+        rv = stripped
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL_REGION.match(rv):
+        rv = _strip(DERIVATIONAL, rv)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = _strip(SUPERLATIVE, rv)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return start + rv
+
+
+def stem_text(text):
+    """Текст как строка основ слов через пробел."""
+    return ' '.join(stem(token) for token in TOKEN.findall(text))
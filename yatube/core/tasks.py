@@ -0,0 +1,260 @@
+"""
+Фоновые задачи: тяжёлые побочные эффекты записи выполняются после
+ответа на запрос.
+
+@task регистрирует функцию, .delay(*args, key=...) ставит её вызов в
+очередь. Куда — решает settings.TASKS_BACKEND:
+
+- eager — сразу, в том же потоке и транзакции (тесты);
+- thread — пул из TASKS_WORKERS потоков этого процесса; задача уходит
+  в пул после коммита транзакции, в которой её поставили;
+- db — строка QueuedTask в той же транзакции, что и сама запись, её
+  выполняет отдельный процесс manage.py run_tasks.
+
+key — ключ идемпотентности: пока вызов с таким ключом ждёт очереди,
+второй не ставится. Задача с batch=True получает список аргументов
+всех ожидающих вызовов одним вызовом. Упавший вызов повторяется до
+retries раз с паузой TASKS_RETRY_DELAY, 2 * TASKS_RETRY_DELAY и т.д.
+Аргументы должны сериализоваться в JSON.
+
+on_commit(func) откладывает до коммита то, что не стоит отдельной
+задачи, но не должно опережать запись: сброс кэшей. В режиме eager
+func, как и задачи, вызывается сразу.
+"""
+import functools
+import json
+import logging
+import queue
+import threading
+from collections import namedtuple
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import metrics
+from core.models import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, retries, batch):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.retries = retries
+        self.batch = batch
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, key=None):
+        get_backend().enqueue(self, list(args), key)
+
+
+def task(func=None, *, retries=3, batch=False):
+    """Регистрирует функцию как фоновую задачу."""
+    if func is None:
+        return functools.partial(task, retries=retries, batch=batch)
+    wrapped = Task(func, retries, batch)
+    _registry[wrapped.name] = wrapped
+    return wrapped
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def retry_delay(attempts):
+    return settings.TASKS_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+
+
+# Вызов задачи в очереди: ref — строка в базе или None.
+Job = namedtuple('Job', 'name args key attempts ref')
+
+
+def execute(task_, jobs):
+    """
+    Выполняет вызовы одной задачи, каждый в своей транзакции (пачку —
+    в одной). Возвращает упавшие вызовы и текст ошибки.
+    """
+    if task_.batch:
+        units = [jobs]
+    else:
+        units = [[job] for job in jobs]
+    failed = []
+    error = ''
+    for unit in units:
+        try:
+            with transaction.atomic():
+                if task_.batch:
+                    task_.func([tuple(job.args) for job in unit])
+                else:
+                    task_.func(*unit[0].args)
+        except Exception as exc:
+            logger.exception('Задача %s упала', task_.name)
+            failed.extend(unit)
+            error = repr(exc)
+    metrics.incr('tasks_done', len(jobs) - len(failed))
+    metrics.incr('tasks_failed', len(failed))
+    return failed, error
+
+
+def by_name(jobs):
+    jobs = sorted(jobs, key=lambda job: job.name)
+    for name, group in groupby(jobs, key=lambda job: job.name):
+        yield name, list(group)
+
+
+class EagerBackend:
+    def enqueue(self, task_, args, key):
+        execute(task_, [Job(task_.name, args, key, 0, None)])
+
+
+class ThreadBackend:
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def enqueue(self, task_, args, key):
+        job = Job(task_.name, args, key, 0, None)
+        transaction.on_commit(lambda: self.put(job))
+
+    def put(self, job):
+        with self.lock:
+            if job.key is not None and job.attempts == 0:
+                if job.key in self.pending:
+                    return
+                self.pending.add(job.key)
+            while len(self.workers) < settings.TASKS_WORKERS:
+                worker = threading.Thread(
+                    target=self.work, name='tasks', daemon=True)
+                worker.start()
+                self.workers.append(worker)
+        self.queue.put(job)
+
+    def take(self):
+        jobs = [self.queue.get()]
+        while len(jobs) < settings.TASKS_BATCH_SIZE:
+            try:
+                jobs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        with self.lock:
+            self.pending.difference_update(job.key for job in jobs)
+        return jobs
+
+    def work(self):
+        while True:
+            jobs = self.take()
+            try:
+                for name, group in by_name(jobs):
+                    self.run(get_task(name), group)
+            finally:
+                close_old_connections()
+
+    def run(self, task_, jobs):
+        failed, _ = execute(task_, jobs)
+        for job in failed:
+            attempts = job.attempts + 1
+            if attempts > task_.retries:
+                continue
+            metrics.incr('tasks_retried')
+            timer = threading.Timer(
+                retry_delay(attempts), self.put,
+                [job._replace(attempts=attempts)])
+            timer.daemon = True
+            timer.start()
+
+
+class DatabaseBackend:
+    def enqueue(self, task_, args, key):
+        QueuedTask.objects.bulk_create([QueuedTask(
+            name=task_.name,
+            args=json.dumps(args),
+            key=key,
+            max_attempts=task_.retries + 1,
+        )], ignore_conflicts=True)
+
+
+def run_pending(batch_size=None):
+    """
+    Выполняет одну пачку готовых задач из базы и возвращает их число.
+    На Postgres несколько воркеров не мешают друг другу: строки
+    захватываются через SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    now = timezone.now()
+    batch_size = batch_size or settings.TASKS_BATCH_SIZE
+    with transaction.atomic():
+        rows = list(
+            QueuedTask.objects.select_for_update(skip_locked=True)
+            .filter(run_after__lte=now, attempts__lt=F('max_attempts'))
+            .order_by('run_after', 'id')[:batch_size]
+        )
+        jobs = [
+            Job(row.name, json.loads(row.args), row.key, row.attempts, row)
+            for row in rows
+        ]
+        done = []
+        for name, group in by_name(jobs):
+            task_ = get_task(name)
+            if task_ is None:
+                failed, error = group, f'Неизвестная задача {name}'
+            else:
+                failed, error = execute(task_, group)
+            failed_ids = {id(job) for job in failed}
+            done.extend(
+                job.ref.pk for job in group if id(job) not in failed_ids)
+            for job in failed:
+                mark_failed(job.ref, error, now)
+        QueuedTask.objects.filter(pk__in=done).delete()
+    return len(rows)
+
+
+def mark_failed(row, error, now):
+    row.attempts += 1
+    row.error = error
+    if row.attempts < row.max_attempts:
+        metrics.incr('tasks_retried')
+        row.run_after = now + timedelta(seconds=retry_delay(row.attempts))
+    else:
+        # Строка остаётся для разбора, но ключ больше ничего не держит.
+        row.key = None
+    row.save(update_fields=['attempts', 'error', 'run_after', 'key'])
+
+
+BACKENDS = {
+    'eager': EagerBackend,
+    'thread': ThreadBackend,
+    'db': DatabaseBackend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    name = settings.TASKS_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+def is_eager():
+    return settings.TASKS_BACKEND == 'eager'
+
+
+def on_commit(func):
+    """Вызывает func после коммита текущей транзакции."""
+    if is_eager():
+        func()
+    else:
+        transaction.on_commit(func)
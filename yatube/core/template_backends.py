@@ -0,0 +1,29 @@
+"""
+Бэкенд шаблонов Django, который замеряет время рендеринга.
+
+Учитывается только рендер шаблона верхнего уровня: include внутри
+него не проходят через бэкенд и не считаются дважды.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from core import metrics
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.incr('template_seconds', time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,64 @@
+"""
+Тестовое окружение: файловый кэш и загруженные файлы тестов живут во
+временных каталогах, которые создаются на время прогона и удаляются
+после него.
+"""
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def temporary_directory(prefix):
+    location = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield location
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+@contextmanager
+def temporary_cache():
+    """Переносит файловый кэш во временный каталог на время прогона."""
+    if settings.CACHE_BACKEND != 'file':
+        yield
+        return
+    with temporary_directory('yatube-cache-') as location:
+        with override_settings(CACHES={
+            'default': dict(settings.CACHES['default'], LOCATION=location),
+        }):
+            yield
+
+
+@contextmanager
+def temporary_media():
+    """
+    Переносит MEDIA_ROOT во временный каталог: картинки постов и их
+    превью из тестов не попадают в настоящий каталог media.
+    """
+    with temporary_directory('yatube-media-') as location:
+        with override_settings(MEDIA_ROOT=location):
+            yield
+
+
+@contextmanager
+def test_environment():
+    with ExitStack() as stack:
+        stack.enter_context(temporary_cache())
+        stack.enter_context(temporary_media())
+        yield
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.environment = test_environment()
+        self.environment.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.environment.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
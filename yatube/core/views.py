@@ -1,6 +1,11 @@
 from http import HTTPStatus
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from core import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html',
@@ -10,3 +15,12 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def prometheus_metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponse(status=HTTPStatus.FORBIDDEN)
+    return HttpResponse(
+        metrics.prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
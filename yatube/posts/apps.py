@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Личные дневники'
+
+    def ready(self):
+        from . import caches, signals  # noqa: F401
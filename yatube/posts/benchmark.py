@@ -0,0 +1,376 @@
+"""
+Замеры производительности страниц, обычно на данных из seeding.
+
+Запросы идут через тестовый клиент Django в этом же процессе, без
+сети, так что замеряется работа приложения, шаблонов и базы. Для
+каждого сценария считаются запросы в секунду, задержки p50/p90/p99 и
+число SQL-запросов на страницу. С threads > 1 запросы идут из
+нескольких потоков, у каждого своё соединение с базой: так видны
+ожидание блокировок и цена открытия соединений. Результат — словарь,
+который сохраняется в JSON и сравнивается с прошлым прогоном.
+
+run_serving() сравнивает WSGI и yatube.asgi по числу одновременных
+соединений с медленными клиентами, вызывая приложения напрямую.
+"""
+import asyncio
+import io
+import math
+import platform
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.asgi import WsgiToAsgi, build_environ
+from core.db import database_settings
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+SCENARIOS = (
+    'index',
+    'popular',
+    'group_post',
+    'profile',
+    'post_detail',
+    'follow_index',
+    'post_create',
+)
+# Метрики, рост которых считается регрессией, и те, где плохо падение.
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'queries')
+HIGHER_IS_BETTER = ('rps',)
+CREATED_TEXT = 'Нагрузочный пост'
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = math.ceil(share * len(ordered)) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class Scenario:
+    def __init__(self, name, url, method='get', data=None):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data or (lambda: None)
+        self.expected_status = 302 if method == 'post' else 200
+
+    def send(self, client):
+        response = getattr(client, self.method)(self.url, self.data())
+        if response.status_code != self.expected_status:
+            raise BenchmarkError(
+                f'{self.name}: {self.url} ответил {response.status_code}')
+        return response
+
+
+def default_reader():
+    """Пользователь с самой большой лентой подписок."""
+    stats = UserStats.objects.order_by('-following_count').first()
+    return stats.user if stats else None
+
+
+def build_scenarios(reader, names=SCENARIOS):
+    """Адреса с самыми «тяжёлыми» объектами набора данных."""
+    author = UserStats.objects.order_by('-posts_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    if author is None or post is None:
+        raise BenchmarkError('Нет данных: сначала выполните seed_benchmark')
+    counter = iter(range(1, 10 ** 9))
+    urls = {
+        'index': reverse('posts:index'),
+        'popular': reverse('posts:popular'),
+        'profile': reverse(
+            'posts:profile', kwargs={'username': author.user.username}),
+        'post_detail': reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}),
+        'follow_index': reverse('posts:follow_index'),
+        'post_create': reverse('posts:post_create'),
+    }
+    if group is not None:
+        urls['group_post'] = reverse(
+            'posts:group_list', kwargs={'slug': group.slug})
+    scenarios = []
+    for name in names:
+        if name not in urls:
+            continue
+        if name == 'post_create':
+            scenarios.append(Scenario(name, urls[name], 'post', lambda: {
+                'text': f'{CREATED_TEXT} {next(counter)}'}))
+        else:
+            scenarios.append(Scenario(name, urls[name]))
+    return scenarios
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: считает SQL-запросы к базе."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def timed(client, scenario, count):
+    """Задержки запросов в мс и число ошибок базы (например, блокировок)."""
+    timings, errors = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            scenario.send(client)
+        except DatabaseError:
+            errors += 1
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, errors
+
+
+def timed_in_thread(make_client, scenario, count):
+    try:
+        return timed(make_client(), scenario, count)
+    finally:
+        # У каждого потока своё соединение, его нужно закрыть.
+        connection.close()
+
+
+def measure(make_client, scenario, requests, warmup, threads=1):
+    client = make_client()
+    # Запросы считаются на первом прогреве, чтобы не замедлять замер.
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        scenario.send(client)
+    for _ in range(max(warmup - 1, 0)):
+        scenario.send(client)
+    started = time.perf_counter()
+    if threads > 1:
+        counts = [requests // threads + (i < requests % threads)
+                  for i in range(threads)]
+        with ThreadPoolExecutor(threads) as executor:
+            parts = list(executor.map(
+                timed_in_thread, [make_client] * threads,
+                [scenario] * threads, counts))
+        timings = [value for part, _ in parts for value in part]
+        errors = sum(part_errors for _, part_errors in parts)
+    else:
+        timings, errors = timed(client, scenario, requests)
+    elapsed = time.perf_counter() - started
+    if not timings:
+        raise BenchmarkError(f'{scenario.name}: все запросы с ошибкой')
+    return {
+        'url': scenario.url,
+        'requests': requests,
+        'threads': threads,
+        'errors': errors,
+        'rps': round(len(timings) / elapsed, 2),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries.count,
+    }
+
+
+def dataset():
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def run(reader, names=SCENARIOS, requests=200, warmup=10, threads=1,
+        log=None):
+    log = log or (lambda message: None)
+
+    def make_client():
+        client = Client()
+        client.force_login(reader)
+        return client
+
+    results = {
+        'created': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'database_settings': database_settings(connection),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'reader': reader.username,
+        'threads': threads,
+        'dataset': dataset(),
+        'scenarios': {},
+    }
+    for scenario in build_scenarios(reader, names):
+        log(f'{scenario.name}: {scenario.url}')
+        results['scenarios'][scenario.name] = measure(
+            make_client, scenario, requests, warmup, threads)
+    # Созданные замером посты удаляются, чтобы прогоны были сравнимы.
+    Post.objects.filter(
+        author=reader, text__startswith=CREATED_TEXT).delete()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Строки (сценарий, метрика, было, стало, изменение в %, регрессия)
+    для сценариев, которые есть в обоих прогонах.
+    """
+    rows = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = previous.get(metric), current[metric]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = change if metric in LOWER_IS_BETTER else -change
+            rows.append((name, metric, old, new, change, worse > threshold))
+    return rows
+
+
+# Ёмкость по соединениям: WSGI против ASGI при медленных клиентах.
+# connections клиентов шлют по requests_per_connection GET-запросов, и
+# каждому нужно delay секунд, чтобы дочитать ответ. WSGI-сервер с threads
+# рабочими потоками держит поток, пока клиент не дочитает; yatube.asgi
+# отдаёт ответ из цикла событий, а потоков у Django столько же.
+SERVING_SCENARIOS = ('index', 'group_post', 'profile', 'post_detail',
+                     'follow_index')
+
+
+def http_scope(url, cookie):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+def summary(timings, elapsed):
+    return {
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 2),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def serve_wsgi(application, scope, connections, requests, threads, delay):
+    def handle(environ):
+        statuses = []
+        result = application(
+            environ, lambda status, headers, exc_info=None:
+            statuses.append(status))
+        try:
+            b''.join(result)
+            # Поток ждёт, пока медленный клиент заберёт ответ.
+            time.sleep(delay)
+        finally:
+            result.close()
+        return statuses[0]
+
+    def client(workers):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = workers.submit(
+                handle, build_environ(scope, io.BytesIO())).result()
+            if not status.startswith('200'):
+                raise BenchmarkError(f'{scope["path"]} ответил {status}')
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as workers, \
+            ThreadPoolExecutor(connections) as clients:
+        parts = list(clients.map(client, [workers] * connections))
+    return summary(
+        [value for part in parts for value in part],
+        time.perf_counter() - started)
+
+
+def serve_asgi(application, scope, connections, requests, delay):
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def client():
+        timings = []
+        for _ in range(requests):
+            statuses = []
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(delay)
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            if statuses != [200]:
+                raise BenchmarkError(f'{scope["path"]} ответил {statuses}')
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    async def main():
+        return await asyncio.gather(*(client() for _ in range(connections)))
+
+    started = time.perf_counter()
+    parts = asyncio.run(main())
+    return summary(
+        [value for part in parts for value in part],
+        time.perf_counter() - started)
+
+
+def run_serving(reader, names=SERVING_SCENARIOS, connections=64,
+                requests=10, threads=8, delay=0.05, log=None):
+    log = log or (lambda message: None)
+    client = Client()
+    client.force_login(reader)
+    cookie = f'{settings.SESSION_COOKIE_NAME}=' + (
+        client.cookies[settings.SESSION_COOKIE_NAME].value)
+    wsgi_application = get_wsgi_application()
+    asgi_application = WsgiToAsgi(wsgi_application, threads=threads)
+    results = {
+        'created': timezone.now().isoformat(),
+        'connections': connections,
+        'requests_per_connection': requests,
+        'threads': threads,
+        'client_delay_ms': delay * 1000,
+        'scenarios': {},
+    }
+    try:
+        for scenario in build_scenarios(reader, names):
+            log(f'{scenario.name}: {scenario.url}')
+            scope = http_scope(scenario.url, cookie)
+            results['scenarios'][scenario.name] = {
+                'wsgi': serve_wsgi(wsgi_application, scope, connections,
+                                   requests, threads, delay),
+                'asgi': serve_asgi(asgi_application, scope, connections,
+                                   requests, delay),
+            }
+    finally:
+        asgi_application.executor.shutdown()
+    return results
@@ -0,0 +1,35 @@
+"""Кэши постов, групп и пользователей, см. core.cache.objects."""
+from core.cache.objects import ObjectCache
+from .models import Group, Post, User
+
+posts = ObjectCache(Post)
+groups = ObjectCache(Group, lookups=('slug',))
+# Только то, что показывают страницы: ни хеш пароля, ни почта в общий
+# кэш не попадают.
+users = ObjectCache(
+    User, lookups=('username',),
+    fields=('username', 'first_name', 'last_name'))
+
+
+def get_posts(ids):
+    """
+    Посты по id в том же порядке, с авторами и группами из их кэшей:
+    три обращения к кэшу на страницу. Удалённые посты пропускаются.
+    """
+    found = posts.get_many(ids)
+    items = [found[pk] for pk in ids if pk in found]
+    authors = users.get_many({post.author_id for post in items})
+    post_groups = groups.get_many({post.group_id for post in items})
+    hydrated = []
+    for post in items:
+        if post.author_id not in authors:
+            continue
+        post.author = authors[post.author_id]
+        post.group = post_groups.get(post.group_id)
+        hydrated.append(post)
+    return hydrated
+
+
+def get_post(pk):
+    found = get_posts([pk])
+    return found[0] if found else None
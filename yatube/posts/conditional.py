@@ -0,0 +1,163 @@
+"""
+Условные GET-запросы для лент и страницы поста.
+
+Время изменения страницы берётся одним коротким запросом по индексу:
+самый свежий Post.updated (у нового поста он равен дате публикации)
+и Comment.created. Удаления, подписки и готовые превью в этих колонках
+не видны, поэтому сигналы ставят метки в кэше: на ленту подписок
+пользователя, на посты автора, на пост, на группу и на главную. Каждая
+страница смотрит только свои метки; общая метка без области остаётся
+для редких событий вроде импорта. Совпавший валидатор даёт 304 без
+выполнения самого view и рендеринга шаблона.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date
+
+from core import tasks
+from . import caches, notifications
+from .models import Comment, Follow, Post
+
+CHANGED_KEY = 'conditional:changed'
+
+
+def _mark_key(scope):
+    if isinstance(scope, tuple):
+        scope = ':'.join(map(str, scope))
+    return f'{CHANGED_KEY}:{scope}'
+
+
+def _mark_keys(scopes):
+    # У поста без группы область ('group', None) просто пропускается.
+    return [
+        _mark_key(scope) for scope in scopes
+        if not isinstance(scope, tuple) or scope[-1] is not None
+    ]
+
+
+def touch(*scopes):
+    """
+    Отмечает изменение, которое не видно по датам постов, после коммита.
+    Области: 'index', ('group', id), ('author', id), ('follow', user_id),
+    ('post', id); без областей метка общая и задевает все страницы.
+    """
+    keys = _mark_keys(scopes) if scopes else [CHANGED_KEY]
+    if keys:
+        tasks.on_commit(lambda: cache.set_many(
+            dict.fromkeys(keys, timezone.now()), None))
+
+
+def _marks(*scopes):
+    """Самая свежая из меток страницы, включая общую."""
+    return _newest(
+        *cache.get_many([CHANGED_KEY] + _mark_keys(scopes)).values())
+
+
+def _newest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _newest_updated(posts):
+    return posts.order_by('-updated').values_list(
+        'updated', flat=True).first()
+
+
+def index_modified(request):
+    return _newest(_newest_updated(Post.objects.all()), _marks('index'))
+
+
+def group_modified(request, slug):
+    # Метки ставятся по id, а он в отличие от slug не меняется.
+    group = caches.groups.get_by('slug', slug)
+    if group is None:
+        return None
+    return _newest(
+        _newest_updated(Post.objects.filter(group_id=group.pk)),
+        _marks(('group', group.pk)),
+    )
+
+
+def profile_modified(request, username):
+    author = caches.users.get_by('username', username)
+    if author is None:
+        return None
+    return _newest(
+        _newest_updated(Post.objects.filter(author_id=author.pk)),
+        _marks(('author', author.pk)),
+    )
+
+
+def follow_modified(request):
+    authors = list(Follow.objects.filter(
+        user=request.user).values_list('author_id', flat=True))
+    modified = Post.objects.filter(author_id__in=authors).aggregate(
+        modified=Max('updated'))['modified']
+    return _newest(modified, _marks(
+        ('follow', request.user.pk),
+        *(('author', author_id) for author_id in authors),
+    ))
+
+
+def post_modified(request, post_id):
+    newest_comment = Comment.objects.filter(
+        post=OuterRef('pk')).order_by('-created').values('created')[:1]
+    # Страница поста показывает и число постов автора.
+    newest_by_author = Post.objects.filter(
+        author=OuterRef('author')).order_by('-updated').values('updated')[:1]
+    row = Post.objects.filter(pk=post_id).annotate(
+        comment=Subquery(newest_comment),
+        by_author=Subquery(newest_by_author),
+    ).values_list('updated', 'comment', 'by_author', 'author_id').first()
+    if row is None:
+        return None
+    *dates, author_id = row
+    return _newest(*dates, _marks(('post', post_id), ('author', author_id)))
+
+
+def make_etag(request, modified):
+    # Страница зависит от пользователя: шапка со счётчиком уведомлений,
+    # кнопки подписки, формы.
+    unread = (
+        notifications.unread_count(request.user)
+        if request.user.is_authenticated else 0
+    )
+    raw = f'{request.user.pk}:{unread}:{modified.isoformat()}'
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional(last_modified):
+    """
+    Аналог django.views.decorators.http.condition: ETag и Last-Modified
+    считаются из одного значения; метки touch() учитывает сама функция
+    last_modified.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            modified = last_modified(request, *args, **kwargs)
+            if modified is None:
+                return view(request, *args, **kwargs)
+            etag = make_etag(request, modified)
+            timestamp = int(modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(timestamp)
+                patch_vary_headers(response, ('Cookie',))
+                # Браузер хранит страницу, но каждый раз сверяется с нами.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,9 @@
+from .notifications import unread_count
+
+
+def notifications(request):
+    # Шаблон вызывает функцию сам, и только в шапке вошедшего
+    # пользователя: остальные страницы не ходят за счётчиком в базу.
+    return {
+        'unread_notifications': lambda: unread_count(request.user),
+    }
@@ -0,0 +1,133 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps as django_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core import tasks
+from . import caches
+from .models import Group, Notification, Post, UserStats
+
+BATCH_SIZE = 1000
+# Модели счётчиков по именам, которыми их называют задачи.
+MODELS = {'user': UserStats, 'group': Group, 'post': Post}
+CACHES = {'group': caches.groups, 'post': caches.posts}
+
+
+def bump(model, pk, **deltas):
+    """Атомарно сдвигает счётчики одной строки: UPDATE ... SET f = f + d."""
+    if pk is None:
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def apply(calls):
+    """
+    Применяет пачку сдвигов (модель, id, поле, сдвиг) из очереди задач:
+    сдвиги одной строки складываются в один UPDATE, так что горячая
+    строка популярного автора блокируется один раз на пачку. Возвращает
+    применённые сдвиги: {(модель, id): {поле: сдвиг}}.
+    """
+    deltas = defaultdict(Counter)
+    for kind, pk, field, delta in calls:
+        deltas[kind, pk][field] += delta
+    applied = {}
+    for (kind, pk), fields in deltas.items():
+        fields = {field: delta for field, delta in fields.items() if delta}
+        if not fields:
+            continue
+        bump(MODELS[kind], pk, **fields)
+        if kind in CACHES:
+            tasks.on_commit(lambda kind=kind, pk=pk: CACHES[kind].delete(pk))
+        applied[kind, pk] = fields
+    return applied
+
+
+def recount_unread(user_ids):
+    """
+    Пересчитывает непрочитанные уведомления по метке прочтения: строки
+    Notification удаляются каскадом вместе с комментарием, постом или
+    подпиской, и сдвигать счётчик на каждую было бы дороже.
+    """
+    UserStats.objects.filter(pk__in=user_ids).update(
+        unread_notifications=_count(
+            Notification, 'recipient', 'user',
+            pk__gt=OuterRef('notifications_read_id')))
+
+
+def get_stats(user):
+    """Счётчики пользователя; недостающая строка создаётся и досчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, created = UserStats.objects.get_or_create(user=user)
+        if created:
+            reconcile(user_ids=[user.pk])
+            stats.refresh_from_db()
+        return stats
+
+
+def _count(model, field, outer='pk', **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}, **filters)
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def reconcile(apps=django_apps, user_ids=None):
+    """
+    Пересчитывает денормализованные счётчики агрегатами и возвращает
+    число исправленных значений. apps позволяет вызывать её из миграций.
+    """
+    User = apps.get_model('auth', 'User')
+    UserStats = apps.get_model('posts', 'UserStats')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    try:
+        Notification = apps.get_model('posts', 'Notification')
+    except LookupError:
+        # Миграции до появления уведомлений.
+        Notification = None
+
+    users = User.objects.filter(stats__isnull=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    missing = [UserStats(user_id=pk) for pk in users.values_list(
+        'pk', flat=True)]
+    UserStats.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+
+    stats = UserStats.objects.all()
+    if user_ids is not None:
+        stats = stats.filter(pk__in=user_ids)
+    fixed = len(missing)
+    targets = [
+        (stats, {
+            'posts_count': _count(Post, 'author', 'user'),
+            'followers_count': _count(Follow, 'author', 'user'),
+            'following_count': _count(Follow, 'user', 'user'),
+        }),
+    ]
+    if Notification is not None:
+        targets[0][1]['unread_notifications'] = _count(
+            Notification, 'recipient', 'user',
+            pk__gt=OuterRef('notifications_read_id'))
+    if user_ids is None:
+        targets += [
+            (Group.objects.all(), {'posts_count': _count(Post, 'group')}),
+            (Post.objects.all(), {'comments_count': _count(Comment, 'post')}),
+        ]
+    for queryset, counters in targets:
+        for field, actual in counters.items():
+            drifted = queryset.annotate(actual=actual).exclude(
+                **{field: F('actual')}).values_list('pk', flat=True)
+            ids = list(drifted)
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                queryset.filter(pk__in=batch).update(**{field: actual})
+            fixed += len(ids)
+    return fixed
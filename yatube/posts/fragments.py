@@ -0,0 +1,16 @@
+from django.core.cache import cache
+
+from core import tasks
+
+# Первые страницы главной и популярной лент, см. CursorPaginator.cache_key.
+INDEX_PAGE_KEY = 'feed:index'
+POPULAR_PAGE_KEY = 'feed:popular'
+# Карточки постов в {% cache %} не сбрасываются: их ключ — id, версия
+# поста и адрес картинки, так что правка даёт новый ключ, а старый
+# истекает сам. Автор выводится вне фрагмента и виден сразу.
+
+
+def invalidate_index():
+    """Сбрасывает первые страницы лент после коммита записи."""
+    tasks.on_commit(
+        lambda: cache.delete_many([INDEX_PAGE_KEY, POPULAR_PAGE_KEY]))
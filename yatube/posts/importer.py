@@ -0,0 +1,297 @@
+"""
+Потоковый импорт групп, постов, комментариев и подписок из JSONL/CSV.
+
+Файлы читаются построчно, строки собираются в пачки для bulk_create,
+а пачки — в транзакции по chunk_size строк, так что память не зависит
+от размера файла. Пользователи и группы ищутся по username и slug
+пачкой на каждую партию строк; недостающие пользователи создаются без
+пароля. Повторный импорт безопасен: дубликаты пропускаются и в число
+загруженных не входят. Посты с неизвестной группой загружаются без
+группы, а сами slug попадают в отчёт. Сигналы при bulk_create не
+срабатывают, поэтому счётчики, ленты, поисковый индекс и оценки
+популярности досчитываются в finish() — и после ошибки посреди файла,
+для уже закоммиченных пачек.
+"""
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import (conditional, counters, fragments, popular, search,
+               snapshots)
+from .models import Comment, Follow, Group, Post, User
+from .seeding import batches, date_fields, keep_dates
+
+FORMATS = ('jsonl', 'csv')
+# SQLite не принимает больше 999 параметров в одном запросе.
+LOOKUP_CHUNK = 500
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def read_rows(path, format_=None):
+    """Строки файла как словари; .gz распаковывается на лету."""
+    name = path[:-3] if path.endswith('.gz') else path
+    format_ = format_ or os.path.splitext(name)[1].lstrip('.')
+    if format_ in ('ndjson', 'json'):
+        format_ = 'jsonl'
+    if format_ not in FORMATS:
+        raise ImportFormatError(f'Неизвестный формат файла: {path}')
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as source:
+        if format_ == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def optional_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def safe_int(value):
+    try:
+        return optional_int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Lookup:
+    """Ключ (username, slug) -> id с ограниченным кэшем."""
+
+    def __init__(self, model, field, create=None, limit=100_000):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.limit = limit
+        self.ids = {}
+
+    def fetch(self, keys):
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            self.ids.update(self.model.objects.filter(**{
+                f'{self.field}__in': keys[start:start + LOOKUP_CHUNK]
+            }).values_list(self.field, 'pk'))
+
+    def resolve(self, keys):
+        keys = {key for key in keys if key}
+        missing = [key for key in keys if key not in self.ids]
+        if len(self.ids) + len(missing) > self.limit:
+            self.ids.clear()
+            missing = list(keys)
+        if missing:
+            self.fetch(missing)
+            absent = [key for key in missing if key not in self.ids]
+            if absent and self.create:
+                self.model.objects.bulk_create(
+                    [self.create(key) for key in absent],
+                    ignore_conflicts=True)
+                self.fetch(absent)
+        return self.ids
+
+
+def existing_ids(model, ids):
+    ids = sorted({pk for pk in ids if pk is not None})
+    found = set()
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        found.update(model.objects.filter(
+            pk__in=ids[start:start + LOOKUP_CHUNK]
+        ).values_list('pk', flat=True))
+    return found
+
+
+@contextlib.contextmanager
+def deferred_indexes(*models):
+    """
+    Удаляет составные индексы Meta.indexes на время загрузки и строит
+    их заново одним проходом в конце, даже если загрузка упала.
+    """
+    dropped = []
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+                dropped.append((model, index))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+class Importer:
+    def __init__(self, batch_size=2000, chunk_size=50_000, log=None):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.users = Lookup(User, 'username', create=lambda username: User(
+            username=username, password='!'))
+        self.groups = Lookup(Group, 'slug')
+        self.now = timezone.now()
+        self.imported = {}
+        self.unknown_groups = set()
+
+    def load(self, model, rows, build):
+        """
+        Пишет строки пачками, по транзакции на chunk_size строк.
+        Возвращает число вставленных строк и пропущенных: битых и
+        дубликатов. bulk_create(ignore_conflicts=True) не сообщает, что
+        вставил, поэтому вставленные — прирост таблицы за загрузку.
+        """
+        name = model.__name__
+        done = 0
+        before = model.objects.count()
+        started = time.monotonic()
+        try:
+            with keep_dates(*date_fields()):
+                for chunk in batches(rows, self.chunk_size):
+                    with transaction.atomic():
+                        for batch in batches(chunk, self.batch_size):
+                            model.objects.bulk_create(
+                                build(batch), ignore_conflicts=True)
+                    done += len(chunk)
+                    rate = done / max(time.monotonic() - started, 1e-6)
+                    self.log(f'{name}: {done} строк ({rate:.0f}/с)')
+        finally:
+            # И после ошибки: закоммиченные пачки досчитает finish().
+            self.imported[name] = model.objects.count() - before
+        return self.imported[name], done - self.imported[name]
+
+    def build_each(self, batch, make):
+        objects = []
+        for row in batch:
+            try:
+                instance = make(row)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if instance is not None:
+                objects.append(instance)
+        return objects
+
+    def import_groups(self, rows):
+        return self.load(Group, rows, lambda batch: self.build_each(
+            batch, lambda row: Group(
+                id=optional_int(row.get('id')),
+                slug=row['slug'],
+                title=row['title'],
+                description=row.get('description') or '',
+            )
+        ))
+
+    def import_posts(self, rows):
+        def build(batch):
+            users = self.users.resolve(row.get('author') for row in batch)
+            groups = self.groups.resolve(row.get('group') for row in batch)
+
+            def make(row):
+                pub_date = parse_date(row.get('pub_date'), self.now)
+                group = row.get('group')
+                if group and group not in groups:
+                    self.unknown_groups.add(group)
+                return Post(
+                    id=optional_int(row.get('id')),
+                    author_id=users[row['author']],
+                    group_id=groups.get(group) if group else None,
+                    text=row['text'],
+                    image=row.get('image') or '',
+                    pub_date=pub_date,
+                    updated=parse_date(row.get('updated'), pub_date),
+                )
+            return self.build_each(batch, make)
+        return self.load(Post, rows, build)
+
+    def report_unknown_groups(self, limit=20):
+        """Строка отчёта о slug групп, которых нет в базе, или None."""
+        if not self.unknown_groups:
+            return None
+        slugs = sorted(self.unknown_groups)
+        listed = ', '.join(slugs[:limit])
+        if len(slugs) > limit:
+            listed += f' и ещё {len(slugs) - limit}'
+        return (f'Неизвестные группы ({len(slugs)}), посты загружены '
+                f'без группы: {listed}')
+
+    def import_comments(self, rows):
+        def build(batch):
+            users = self.users.resolve(row.get('author') for row in batch)
+            posts = existing_ids(
+                Post, (safe_int(row.get('post')) for row in batch))
+
+            def make(row):
+                post_id = int(row['post'])
+                if post_id not in posts:
+                    return None
+                return Comment(
+                    id=optional_int(row.get('id')),
+                    post_id=post_id,
+                    author_id=users[row['author']],
+                    text=row['text'],
+                    created=parse_date(row.get('created'), self.now),
+                )
+            return self.build_each(batch, make)
+        return self.load(Comment, rows, build)
+
+    def import_follows(self, rows):
+        def build(batch):
+            users = self.users.resolve(
+                key for row in batch
+                for key in (row.get('user'), row.get('author')))
+
+            def make(row):
+                user_id, author_id = users[row['user']], users[row['author']]
+                if user_id == author_id:
+                    return None
+                return Follow(user_id=user_id, author_id=author_id)
+            return self.build_each(batch, make)
+        return self.load(Follow, rows, build)
+
+    def finish(self, rebuild_timeline=True, rebuild_search=True):
+        """Досчитывает то, что при обычном save() делают сигналы."""
+        self.log('Сброс последовательностей id')
+        sequences = connection.ops.sequence_reset_sql(
+            no_style(), [Group, Post, Comment, Follow])
+        with connection.cursor() as cursor:
+            for sql in sequences:
+                cursor.execute(sql)
+        self.log('Пересчёт счётчиков')
+        with transaction.atomic():
+            counters.reconcile()
+        imported = {name for name, count in self.imported.items() if count}
+        if rebuild_timeline and imported & {'Post', 'Follow'}:
+            self.log('Заполнение лент подписок')
+            call_command('backfill_timeline', stdout=io.StringIO())
+        if rebuild_search and imported & {'Post', 'Comment'}:
+            self.log('Построение поискового индекса')
+            with transaction.atomic():
+                search.rebuild(Post, Comment, batch_size=self.batch_size)
+        if imported & {'Post', 'Comment', 'Follow'}:
+            self.log('Пересчёт оценок популярности')
+            popular.rescore(Post.objects.all())
+        fragments.invalidate_index()
+        snapshots.invalidate_groups(Group.objects.values_list('pk', flat=True))
+        conditional.touch()
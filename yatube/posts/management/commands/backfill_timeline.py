@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованные ленты подписок по таблице Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Пересобрать ленту только этого пользователя')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить существующие записи перед заполнением')
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.order_by('pk')
+        entries = TimelineEntry.objects.all()
+        if options['user']:
+            follows = follows.filter(user__username=options['user'])
+            entries = entries.filter(user__username=options['user'])
+        if options['clear']:
+            entries.delete()
+        done = 0
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').iterator():
+            with transaction.atomic():
+                timeline.backfill_follow(user_id, author_id)
+            done += 1
+            if done % 1000 == 0:
+                self.stdout.write(f'Обработано подписок: {done}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обработано подписок: {done}'))
@@ -0,0 +1,82 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.models import User
+from posts.seeding import USERNAME
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запросы в секунду, задержки и число SQL-запросов '
+        'основных страниц и сохраняет результат в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Сколько потоков шлют запросы одновременно')
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIOS,
+            help='Сценарий для замера, можно несколько; по умолчанию все')
+        parser.add_argument(
+            '--reader', help='Пользователь для ленты подписок и постинга')
+        parser.add_argument('--output', help='Файл для результата в JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--max-regression', type=float, default=20.0,
+            help='Допустимое ухудшение метрик при --compare, в процентах')
+
+    def get_reader(self, username):
+        username = username or USERNAME.format(0)
+        reader = User.objects.filter(username=username).first()
+        return reader or benchmark.default_reader()
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write(
+                'DEBUG включён: задержки будут выше, чем в продакшене')
+        reader = self.get_reader(options['reader'])
+        if reader is None:
+            raise CommandError('Нет пользователей: выполните seed_benchmark')
+        try:
+            results = benchmark.run(
+                reader,
+                names=options['scenario'] or benchmark.SCENARIOS,
+                requests=options['requests'],
+                warmup=options['warmup'],
+                threads=options['threads'],
+                log=self.stdout.write,
+            )
+        except benchmark.BenchmarkError as exc:
+            raise CommandError(exc)
+        for name, row in results['scenarios'].items():
+            self.stdout.write(
+                f'{name:<14} {row["rps"]:>9.1f} rps  '
+                f'p50 {row["p50_ms"]:>8.2f} ms  p99 {row["p99_ms"]:>8.2f} ms  '
+                f'{row["queries"]:>3} SQL  {row["errors"]} ошибок'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, ensure_ascii=False)
+        if options['compare']:
+            self.compare(results, options['compare'],
+                         options['max_regression'])
+
+    def compare(self, results, path, threshold):
+        with open(path) as baseline:
+            rows = benchmark.compare(results, json.load(baseline), threshold)
+        regressions = [row for row in rows if row[-1]]
+        for name, metric, old, new, change, regression in rows:
+            line = (f'{name:<14} {metric:<8} {old:>10} -> {new:<10} '
+                    f'{change:+.1f}%')
+            self.stdout.write(
+                self.style.ERROR(line) if regression else line)
+        if regressions:
+            raise CommandError(
+                f'Ухудшение больше {threshold}% в {len(regressions)} метриках')
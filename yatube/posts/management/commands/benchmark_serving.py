@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.models import User
+from posts.seeding import USERNAME
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI на множестве одновременных соединений '
+        'с медленными клиентами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=64)
+        parser.add_argument(
+            '--requests', type=int, default=10,
+            help='Запросов на одно соединение')
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Рабочих потоков WSGI-сервера и пула ASGI')
+        parser.add_argument(
+            '--client-delay', type=float, default=50,
+            help='Сколько мс клиент дочитывает ответ')
+        parser.add_argument(
+            '--scenario', action='append',
+            choices=benchmark.SERVING_SCENARIOS)
+        parser.add_argument('--output', help='Файл для результата в JSON')
+
+    def handle(self, *args, **options):
+        reader = (
+            User.objects.filter(username=USERNAME.format(0)).first()
+            or benchmark.default_reader()
+        )
+        if reader is None:
+            raise CommandError('Нет пользователей: выполните seed_benchmark')
+        try:
+            results = benchmark.run_serving(
+                reader,
+                names=options['scenario'] or benchmark.SERVING_SCENARIOS,
+                connections=options['connections'],
+                requests=options['requests'],
+                threads=options['threads'],
+                delay=options['client_delay'] / 1000,
+                log=self.stdout.write,
+            )
+        except benchmark.BenchmarkError as exc:
+            raise CommandError(exc)
+        for name, modes in results['scenarios'].items():
+            for mode, row in modes.items():
+                self.stdout.write(
+                    f'{name:<14} {mode:<5} {row["rps"]:>9.1f} rps  '
+                    f'p50 {row["p50_ms"]:>8.2f} ms  '
+                    f'p99 {row["p99_ms"]:>8.2f} ms'
+                )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, ensure_ascii=False)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import User
+
+FORMATS = {'zip': export.export_zip, 'jsonl': export.export_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки пользователя в zip '
+        'или JSONL без веб-запроса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--output', metavar='PATH', required=True)
+        parser.add_argument('--format', choices=FORMATS, default='zip')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in FORMATS[options['format']](user):
+                output.write(chunk)
+                size += len(chunk)
+        self.stdout.write(f'{options["output"]}: {size} байт')
@@ -0,0 +1,69 @@
+import contextlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import (FORMATS, ImportFormatError, Importer,
+                            deferred_indexes, read_rows)
+from posts.models import Comment, Post
+
+# Порядок важен: посты ссылаются на группы, комментарии — на посты.
+KINDS = ('groups', 'posts', 'comments', 'follows')
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, посты, комментарии и подписки из JSONL или '
+        'CSV пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(
+                f'--{kind}', metavar='PATH',
+                help=f'Файл с записями ({kind}), можно .gz')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файлов, по умолчанию — по расширению')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--chunk-size', type=int, default=50_000,
+            help='Сколько строк писать в одной транзакции')
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Удалить составные индексы на время загрузки')
+        parser.add_argument('--skip-timeline', action='store_true')
+        parser.add_argument('--skip-search', action='store_true')
+
+    def handle(self, *args, **options):
+        kinds = [kind for kind in KINDS if options[kind]]
+        if not kinds:
+            raise CommandError('Укажите хотя бы один файл: --posts и т.п.')
+        importer = Importer(
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        deferred = (
+            deferred_indexes(Post, Comment) if options['defer_indexes']
+            else contextlib.nullcontext()
+        )
+        try:
+            with deferred:
+                for kind in kinds:
+                    rows = read_rows(options[kind], options['format'])
+                    imported, skipped = getattr(
+                        importer, f'import_{kind}')(rows)
+                    self.stdout.write(
+                        f'{kind}: загружено {imported}, пропущено {skipped}')
+        except (ImportFormatError, OSError, ValueError) as exc:
+            raise CommandError(exc)
+        finally:
+            unknown_groups = importer.report_unknown_groups()
+            if unknown_groups:
+                self.stderr.write(unknown_groups)
+            # Пачки до ошибки уже закоммичены: их тоже нужно досчитать.
+            importer.finish(
+                rebuild_timeline=not options['skip_timeline'],
+                rebuild_search=not options['skip_search'],
+            )
+        self.stdout.write(self.style.SUCCESS('Импорт завершён'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import fragments, popular
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает оценки популярности свежих постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все посты, а не только за POPULAR_WINDOW_DAYS')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            changed = popular.rescore(popular.Post.objects.all())
+        else:
+            changed = popular.recompute()
+        if changed:
+            fragments.invalidate_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Изменено оценок: {changed}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import PRESETS, Seeder
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для нагрузочных замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset', choices=PRESETS, default='small',
+            help='Размер набора: tiny, small или large (5 млн постов)')
+        for name in PRESETS['small']:
+            parser.add_argument(
+                f'--{name}', type=int,
+                help=f'Переопределить число записей: {name}')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: один и тот же набор на каждом прогоне')
+        parser.add_argument(
+            '--timeline-users', type=int, default=100,
+            help='Скольким пользователям заполнить ленты подписок')
+        parser.add_argument(
+            '--skip-search', action='store_true',
+            help='Не строить поисковый индекс')
+
+    def handle(self, *args, **options):
+        sizes = dict(PRESETS[options['preset']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        seeder = Seeder(
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        seeder.run(
+            timeline_users=options['timeline_users'],
+            index_search=not options['skip_search'],
+            **sizes,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: ' + ', '.join(f'{k}={v}' for k, v in sizes.items())))
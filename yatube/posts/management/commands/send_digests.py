@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Рассылает письма-сводки уведомлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=60.0,
+            help='Пауза в секундах между проверками')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разослать то, что готово сейчас, и выйти')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_digests()
+            if sent:
+                self.stdout.write(f'Отправлено сводок: {sent}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
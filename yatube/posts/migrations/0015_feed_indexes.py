@@ -0,0 +1,58 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:51
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    from posts.counters import reconcile
+    Follow = apps.get_model('posts', 'Follow')
+    seen = set()
+    duplicates = []
+    rows = Follow.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'author_id')
+    for pk, user_id, author_id in rows.iterator():
+        if (user_id, author_id) in seen or user_id == author_id:
+            duplicates.append(pk)
+        seen.add((user_id, author_id))
+    for start in range(0, len(duplicates), 1000):
+        Follow.objects.filter(pk__in=duplicates[start:start + 1000]).delete()
+    if duplicates:
+        reconcile(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='prevent_self_follow'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import rebuild
+    rebuild(
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'Comment'),
+        conn=schema_editor.connection,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    from posts.search import get_backend
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).drop(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_post_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='digest_sent',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя сводка'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='notifications_mailed_id',
+            field=models.PositiveIntegerField(default=0, verbose_name='Отправлено письмом до уведомления'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='notifications_read_id',
+            field=models.PositiveIntegerField(default=0, verbose_name='Прочитано до уведомления'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитанные уведомления'),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('follow', 'Новый подписчик'), ('comment', 'Новый комментарий')], max_length=16, verbose_name='Событие')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'verbose_name': 'Уведомление',
+                'verbose_name_plural': 'Уведомления',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-id'], name='notification_recipient_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+def fill_scores(apps, schema_editor):
+    from posts.popular import rescore
+    rescore(apps.get_model('posts', 'Post').objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score', '-id'], name='post_score_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
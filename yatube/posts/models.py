@@ -14,6 +14,11 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Краткое описание'
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов'
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -32,6 +37,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -56,11 +65,52 @@ class Post(models.Model):
         default=True,
         verbose_name='Публикация'
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+    # Оценка для ленты «Популярное», см. posts.popular.
+    score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность'
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Личный дневник'
         verbose_name_plural = 'Личные дневники'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-updated'],
+                name='post_updated_idx'
+            ),
+            models.Index(
+                fields=['author', '-updated'],
+                name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=['group', '-updated'],
+                name='post_group_updated_idx'
+            ),
+            models.Index(
+                fields=['-score', '-id'],
+                name='post_score_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -91,6 +141,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -114,6 +170,163 @@ class Follow(models.Model):
         ordering = ['-user']
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+    unread_notifications = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Непрочитанные уведомления'
+    )
+    # Уведомления с id не больше этих меток прочитаны и попали в письмо.
+    notifications_read_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Прочитано до уведомления'
+    )
+    notifications_mailed_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Отправлено письмом до уведомления'
+    )
+    digest_sent = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Последняя сводка'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user}'
+
+
+class Notification(models.Model):
+    FOLLOW = 'follow'
+    COMMENT = 'comment'
+    KINDS = (
+        (FOLLOW, 'Новый подписчик'),
+        (COMMENT, 'Новый комментарий'),
+    )
+
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Кто'
+    )
+    kind = models.CharField(
+        max_length=16,
+        choices=KINDS,
+        verbose_name='Событие'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Комментарий'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(
+                fields=['recipient', '-id'],
+                name='notification_recipient_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} для {self.recipient}'
@@ -0,0 +1,161 @@
+"""
+Уведомления автору о новых подписчиках и комментариях к его постам.
+
+Сигналы только ставят фоновую задачу; она пачкой читает события,
+вставляет строки Notification одним bulk_create и сдвигает счётчик
+непрочитанных одним UPDATE на каждое встречающееся приращение, так что
+сотня комментариев популярному автору — это не сотня записей в его
+строку UserStats. Число непрочитанных читается из UserStats по ключу.
+
+Прочитанное и отправленное письмом отмечается метками id в UserStats,
+а не флагом в каждой строке. Письма — сводки: send_digests отправляет
+пользователю одно письмо со всеми новыми уведомлениями не чаще раза в
+NOTIFICATIONS_DIGEST_INTERVAL секунд.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from . import counters
+from .models import Comment, Follow, Notification, UserStats
+
+DIGEST_BATCH_SIZE = 500
+
+
+def collect(follows, comments):
+    """
+    Уведомления по парам (подписчик, автор) и id комментариев. Отменённые
+    подписки, удалённые комментарии и комментарии к своим постам
+    пропускаются.
+    """
+    notifications = []
+    if follows:
+        condition = Q()
+        for user_id, author_id in set(follows):
+            condition |= Q(user_id=user_id, author_id=author_id)
+        for user_id, author_id in Follow.objects.filter(
+                condition).values_list('user_id', 'author_id'):
+            notifications.append(Notification(
+                recipient_id=author_id, actor_id=user_id,
+                kind=Notification.FOLLOW))
+    if comments:
+        rows = Comment.objects.filter(pk__in=set(comments)).exclude(
+            author=F('post__author')).values_list(
+            'pk', 'post_id', 'post__author_id', 'author_id')
+        for pk, post_id, recipient_id, author_id in rows:
+            notifications.append(Notification(
+                recipient_id=recipient_id, actor_id=author_id,
+                kind=Notification.COMMENT, post_id=post_id, comment_id=pk))
+    return notifications
+
+
+def deliver(notifications):
+    """Сохраняет уведомления и сдвигает счётчики получателей."""
+    Notification.objects.bulk_create(notifications)
+    by_recipient = Counter(item.recipient_id for item in notifications)
+    recipients = defaultdict(list)
+    for recipient_id, count in by_recipient.items():
+        recipients[count].append(recipient_id)
+    for count, ids in recipients.items():
+        UserStats.objects.filter(pk__in=ids).update(
+            unread_notifications=F('unread_notifications') + count)
+
+
+def mark_read(user):
+    """
+    Отмечает прочитанным всё, что пришло до этого момента. Счётчик
+    уменьшается на число отмеченных строк, а не обнуляется: уведомления,
+    доставленные параллельно, остаются непрочитанными.
+    """
+    stats = counters.get_stats(user)
+    newest = user.notifications.values_list('pk', flat=True).first()
+    if newest is None or newest <= stats.notifications_read_id:
+        return
+    read = user.notifications.filter(
+        pk__gt=stats.notifications_read_id, pk__lte=newest).count()
+    # Условие на старую метку не даёт двум вкладкам вычесть одно дважды.
+    UserStats.objects.filter(
+        pk=user.pk, notifications_read_id=stats.notifications_read_id
+    ).update(
+        notifications_read_id=newest,
+        unread_notifications=Greatest(F('unread_notifications') - read, 0),
+    )
+
+
+def unread_count(user):
+    return counters.get_stats(user).unread_notifications
+
+
+def due_digests(now):
+    """Получатели, которым пора прислать сводку и есть что прислать."""
+    since = Greatest('notifications_read_id', 'notifications_mailed_id')
+    fresh = Notification.objects.filter(
+        recipient=OuterRef('user'), pk__gt=OuterRef('since'))
+    interval = timedelta(seconds=settings.NOTIFICATIONS_DIGEST_INTERVAL)
+    return UserStats.objects.filter(
+        Q(digest_sent__isnull=True) | Q(digest_sent__lte=now - interval),
+        unread_notifications__gt=0,
+    ).exclude(user__email='').annotate(
+        since=since, has_fresh=Exists(fresh),
+    ).filter(has_fresh=True).values_list('user_id', 'user__email', 'since')
+
+
+def render_digest(items, total):
+    lines = []
+    for item in items:
+        if item.kind == Notification.FOLLOW:
+            lines.append(f'{item.actor} подписался на вас')
+        else:
+            lines.append(
+                f'{item.actor} прокомментировал ваш пост «{item.post}»: '
+                f'{Truncator(item.comment.text).chars(100)}')
+    if total > len(items):
+        lines.append(f'…и ещё {total - len(items)}')
+    return '\n'.join(lines)
+
+
+def build_digest(user_id, email, since):
+    """Письмо со свежими уведомлениями и id самого нового из них."""
+    fresh = Notification.objects.filter(recipient_id=user_id, pk__gt=since)
+    items = list(fresh.select_related('actor', 'post', 'comment')[
+        :settings.NOTIFICATIONS_DIGEST_ITEMS])
+    if not items:
+        return None, since
+    total = fresh.count()
+    message = EmailMessage(
+        subject=f'Yatube: новых уведомлений — {total}',
+        body=render_digest(items, total),
+        to=[email],
+    )
+    return message, items[0].pk
+
+
+def send_digests(now=None):
+    """Рассылает сводки одним соединением с почтой; возвращает их число."""
+    now = now or timezone.now()
+    recipients = list(due_digests(now))
+    connection = get_connection()
+    sent = 0
+    for start in range(0, len(recipients), DIGEST_BATCH_SIZE):
+        messages = []
+        marks = []
+        for user_id, email, since in recipients[
+                start:start + DIGEST_BATCH_SIZE]:
+            message, newest = build_digest(user_id, email, since)
+            if message is not None:
+                messages.append(message)
+                marks.append((user_id, newest))
+        connection.send_messages(messages)
+        with transaction.atomic():
+            for user_id, newest in marks:
+                UserStats.objects.filter(pk=user_id).update(
+                    notifications_mailed_id=newest, digest_sent=now)
+        sent += len(messages)
+    return sent
@@ -0,0 +1,104 @@
+"""
+Лента «Популярное»: посты по убыванию сохранённого Post.score.
+
+score = log2(1 + комментарии + POPULAR_FOLLOWER_WEIGHT * подписчики
+автора) + (время публикации - EPOCH) / POPULAR_HALF_LIFE.
+
+Второе слагаемое растёт со временем, поэтому пост на POPULAR_HALF_LIFE
+секунд новее равен посту с вдвое большим откликом: старые посты
+опускаются без пересчёта, а порядок по score не зависит от текущего
+времени. Значит, его можно хранить в колонке с индексом и читать ленту
+тем же запросом по ключу, что и хронологическую.
+
+Оценка поста пересчитывается фоновой задачей при появлении и удалении
+комментариев, а пачкой — командой recompute_popular для постов за
+последние POPULAR_WINDOW_DAYS дней: так учитываются изменения числа
+подписчиков. Пачка считается векторно через NumPy из requirements.txt;
+без него, например в урезанном окружении, — на чистом Python.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from core import tasks
+from . import caches
+from .models import Post
+
+# Начало отсчёта времени публикации: оценки остаются небольшими числами.
+EPOCH = 1672531200
+CHUNK_SIZE = 2000
+# Изменения меньше этого не записываются.
+TOLERANCE = 1e-9
+ORDERING = ('-score', '-pk')
+
+
+def compute_scores(timestamps, comments, followers):
+    weight = settings.POPULAR_FOLLOWER_WEIGHT
+    half_life = settings.POPULAR_HALF_LIFE
+    if numpy is not None:
+        engagement = (
+            numpy.asarray(comments, dtype=numpy.float64)
+            + weight * numpy.asarray(followers, dtype=numpy.float64)
+        )
+        age = numpy.asarray(timestamps, dtype=numpy.float64) - EPOCH
+        return (numpy.log2(1 + engagement) + age / half_life).tolist()
+    return [
+        math.log2(1 + comment_count + weight * follower_count)
+        + (timestamp - EPOCH) / half_life
+        for timestamp, comment_count, follower_count
+        in zip(timestamps, comments, followers)
+    ]
+
+
+def rescore(posts):
+    """
+    Пересчитывает оценки постов из queryset и возвращает число
+    изменённых. Принимает и модели из apps миграций.
+    """
+    model = posts.model
+    rows = posts.annotate(
+        followers=Coalesce('author__stats__followers_count', 0),
+    ).values_list('pk', 'pub_date', 'comments_count', 'followers', 'score')
+    changed = 0
+    last = 0
+    # Пачки по ключу, а не iterator(): SQLite не изолирует открытый
+    # курсор от записи в ту же таблицу.
+    while True:
+        chunk = list(rows.filter(pk__gt=last).order_by('pk')[:CHUNK_SIZE])
+        if not chunk:
+            return changed
+        changed += _save(model, chunk)
+        last = chunk[-1][0]
+
+
+def _save(model, rows):
+    ids, dates, comments, followers, old = zip(*rows)
+    scores = compute_scores(
+        [date.timestamp() for date in dates], comments, followers)
+    # bulk_update не трогает auto_now: дата изменения поста остаётся.
+    updates = [
+        model(pk=pk, score=score)
+        for pk, score, previous in zip(ids, scores, old)
+        if abs(score - previous) > TOLERANCE
+    ]
+    model.objects.bulk_update(updates, ['score'], batch_size=500)
+    # Курсоры ленты берутся из постов кэша объектов: оценка в них должна
+    # совпадать с базой.
+    changed_ids = [post.pk for post in updates]
+    tasks.on_commit(lambda: caches.posts.delete_many(changed_ids))
+    return len(updates)
+
+
+def recompute(now=None):
+    """Пересчёт за окно POPULAR_WINDOW_DAYS: подписчики авторов меняются."""
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.POPULAR_WINDOW_DAYS)
+    return rescore(Post.objects.filter(pub_date__gte=since))
@@ -0,0 +1,241 @@
+"""
+Полнотекстовый поиск по постам и комментариям.
+
+Индекс — отдельная таблица posts_search: в SQLite это виртуальная
+таблица FTS5 с заранее выделенными основами слов, в PostgreSQL —
+tsvector с русской конфигурацией и GIN-индексом. Документ поста имеет
+rowid 2 * id, документ комментария — 2 * id + 1, поэтому обновление и
+удаление идут по первичному ключу. Прочие СУБД ищут через icontains.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from core.stemmer import TOKEN, stem_text
+from .models import Post
+
+POST, COMMENT = 0, 1
+# Совпадение в комментарии весит вдвое меньше, чем в самом посте.
+COMMENT_WEIGHT = 0.5
+
+
+def doc_id(kind, pk):
+    return pk * 2 + kind
+
+
+class SQLiteBackend:
+    def create(self, cursor):
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+            'body, post_id UNINDEXED, tokenize="unicode61")'
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+    def clear(self, cursor):
+        cursor.execute('DELETE FROM posts_search')
+
+    def index(self, cursor, documents):
+        documents = list(documents)
+        cursor.executemany(
+            'DELETE FROM posts_search WHERE rowid = %s',
+            [(rowid,) for rowid, _, _ in documents]
+        )
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, body, post_id) '
+            'VALUES (%s, %s, %s)',
+            [(rowid, stem_text(text), post_id)
+             for rowid, post_id, text in documents]
+        )
+
+    def delete(self, cursor, rowids):
+        cursor.executemany(
+            'DELETE FROM posts_search WHERE rowid = %s',
+            [(rowid,) for rowid in rowids]
+        )
+
+    def match(self, query):
+        terms = stem_text(query).split()
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def search(self, cursor, query, limit, offset):
+        cursor.execute(
+            'SELECT post_id, MIN(CASE WHEN rowid %% 2 = 0 THEN rank '
+            'ELSE rank * %s END) AS score FROM posts_search '
+            'WHERE posts_search MATCH %s GROUP BY post_id '
+            'ORDER BY score, post_id DESC LIMIT %s OFFSET %s',
+            [COMMENT_WEIGHT, self.match(query), limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def count(self, cursor, query):
+        cursor.execute(
+            'SELECT COUNT(DISTINCT post_id) FROM posts_search '
+            'WHERE posts_search MATCH %s',
+            [self.match(query)]
+        )
+        return cursor.fetchone()[0]
+
+
+class PostgresBackend:
+    def create(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS posts_search ('
+            'id bigint PRIMARY KEY, post_id integer NOT NULL, '
+            'document tsvector NOT NULL)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS posts_search_document_idx '
+            'ON posts_search USING GIN (document)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS posts_search_post_idx '
+            'ON posts_search (post_id)'
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+    def clear(self, cursor):
+        cursor.execute('TRUNCATE posts_search')
+
+    def index(self, cursor, documents):
+        cursor.executemany(
+            'INSERT INTO posts_search (id, post_id, document) '
+            "VALUES (%s, %s, to_tsvector('russian', %s)) "
+            'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document',
+            list(documents)
+        )
+
+    def delete(self, cursor, rowids):
+        cursor.execute(
+            'DELETE FROM posts_search WHERE id = ANY(%s)', [list(rowids)])
+
+    def search(self, cursor, query, limit, offset):
+        cursor.execute(
+            'SELECT post_id, MAX(ts_rank(document, query) * CASE '
+            'WHEN id %% 2 = 0 THEN 1 ELSE %s END) AS score '
+            "FROM posts_search, plainto_tsquery('russian', %s) query "
+            'WHERE document @@ query GROUP BY post_id '
+            'ORDER BY score DESC, post_id DESC LIMIT %s OFFSET %s',
+            [COMMENT_WEIGHT, query, limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def count(self, cursor, query):
+        cursor.execute(
+            'SELECT COUNT(DISTINCT post_id) FROM posts_search '
+            "WHERE document @@ plainto_tsquery('russian', %s)",
+            [query]
+        )
+        return cursor.fetchone()[0]
+
+
+class FallbackBackend:
+    """Без индекса: для СУБД, где нет ни FTS5, ни tsvector."""
+
+    def create(self, cursor):
+        pass
+
+    drop = clear = create
+
+    def index(self, cursor, documents):
+        pass
+
+    def delete(self, cursor, rowids):
+        pass
+
+    def queryset(self, query):
+        condition = Q()
+        for term in TOKEN.findall(query):
+            condition &= (
+                Q(text__icontains=term) | Q(comments__text__icontains=term))
+        return Post.objects.filter(condition).distinct().values_list(
+            'pk', flat=True)
+
+    def search(self, cursor, query, limit, offset):
+        return list(self.queryset(query)[offset:offset + limit])
+
+    def count(self, cursor, query):
+        return self.queryset(query).count()
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(conn=connection):
+    return BACKENDS.get(conn.vendor, FallbackBackend)()
+
+
+def index_documents(documents):
+    """documents — тройки (rowid, post_id, текст)."""
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, documents)
+
+
+def index_post(post):
+    index_documents([(doc_id(POST, post.pk), post.pk, post.text)])
+
+
+def index_comment(comment):
+    index_documents([
+        (doc_id(COMMENT, comment.pk), comment.post_id, comment.text)])
+
+
+def remove_documents(rowids):
+    with connection.cursor() as cursor:
+        get_backend().delete(cursor, rowids)
+
+
+def rebuild(post_model, comment_model, batch_size=1000, conn=connection):
+    """Пересоздаёт индекс целиком; модели передаются и из миграции."""
+    backend = get_backend(conn)
+    with conn.cursor() as cursor:
+        backend.create(cursor)
+        backend.clear(cursor)
+        sources = [
+            (POST, post_model.objects.values_list('pk', 'id', 'text')),
+            (COMMENT, comment_model.objects.values_list(
+                'pk', 'post_id', 'text')),
+        ]
+        for kind, rows in sources:
+            batch = []
+            for pk, post_id, text in rows.order_by().iterator():
+                batch.append((doc_id(kind, pk), post_id, text))
+                if len(batch) >= batch_size:
+                    backend.index(cursor, batch)
+                    batch = []
+            backend.index(cursor, batch)
+
+
+class SearchResults:
+    """
+    Ленивая последовательность найденных постов для Paginator:
+    count() и срез выполняют по одному запросу к индексу.
+    """
+
+    def __init__(self, query, queryset):
+        self.query = query
+        self.queryset = queryset
+
+    def count(self):
+        if not TOKEN.search(self.query):
+            return 0
+        with connection.cursor() as cursor:
+            return get_backend().count(cursor, self.query)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            ids = get_backend().search(
+                cursor, self.query, index.stop - start, start)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def __len__(self):
+        return self.count()
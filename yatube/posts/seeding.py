@@ -0,0 +1,225 @@
+"""
+Синтетические данные для нагрузочных замеров.
+
+Строки вставляются через bulk_create пачками в отдельных транзакциях,
+поэтому память не растёт с размером набора. Сигналы при этом не
+срабатывают: счётчики, ленты подписок, поисковый индекс и оценки
+популярности досчитываются в конце одним проходом. Популярность авторов
+распределена по Ципфу, так что у верхних авторов подписчиков больше
+TIMELINE_FANOUT_LIMIT и лента подписок проверяется в обоих режимах.
+"""
+import contextlib
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, popular, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+USERNAME = 'bench_{}'
+PASSWORD = 'bench-password'
+SENTENCES = 2000
+PRESETS = {
+    'tiny': {
+        'users': 50, 'groups': 5, 'posts': 500,
+        'follows': 500, 'comments': 1000,
+    },
+    'small': {
+        'users': 2000, 'groups': 50, 'posts': 50_000,
+        'follows': 100_000, 'comments': 200_000,
+    },
+    'large': {
+        'users': 100_000, 'groups': 1000, 'posts': 5_000_000,
+        'follows': 20_000_000, 'comments': 10_000_000,
+    },
+}
+
+
+@contextlib.contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now и auto_now_add, чтобы сохранить заданные даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def date_fields():
+    return [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Seeder:
+    def __init__(self, batch_size=5000, seed=0, days=365, log=None):
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        faker = Faker('ru_RU')
+        faker.seed_instance(seed)
+        # Faker медленный, поэтому тексты собираются из готовых фраз.
+        self.sentences = [faker.sentence(nb_words=10)
+                          for _ in range(SENTENCES)]
+        self.words = [faker.word() for _ in range(SENTENCES)]
+        self.now = timezone.now()
+        self.span = timedelta(days=days)
+        self.log = log or (lambda message: None)
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.sentences, k=sentences))
+
+    def insert(self, model, rows, total):
+        done = 0
+        for batch in batches(rows, self.batch_size):
+            # Размер одного INSERT Django подбирает под лимиты СУБД сам.
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            done += len(batch)
+            self.log(f'{model.__name__}: {done}/{total}')
+
+    def popularity(self, user_ids):
+        """Накопленные веса Ципфа: первые авторы самые популярные."""
+        weights = itertools.accumulate(
+            1 / (rank + 1) for rank in range(len(user_ids)))
+        return list(weights)
+
+    def date_at(self, position, total):
+        """Даты растут вместе с id, как у настоящей ленты."""
+        return self.now - self.span + self.span * (position / max(total, 1))
+
+    def users(self, count):
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(username=USERNAME.format(number), password=password,
+                 first_name=self.random.choice(self.words))
+            for number in range(count)
+        ), count)
+        return list(User.objects.filter(
+            username__startswith=USERNAME.format('')
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def groups(self, count):
+        self.insert(Group, (
+            Group(title=f'Группа {number}', slug=f'bench-{number}',
+                  description=self.text(2))
+            for number in range(count)
+        ), count)
+        return list(Group.objects.filter(
+            slug__startswith='bench-').values_list('pk', flat=True))
+
+    def posts(self, count, user_ids, group_ids):
+        before = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        weights = self.popularity(user_ids)
+        with keep_dates(*date_fields()):
+            self.insert(Post, (
+                self.post(position, count, user_ids, weights, group_ids)
+                for position in range(count)
+            ), count)
+        # Новые посты занимают непрерывный диапазон id после before.
+        return Post.objects.filter(pk__gt=before).aggregate(
+            first=Min('pk'), last=Max('pk'))
+
+    def post(self, position, count, user_ids, weights, group_ids):
+        pub_date = self.date_at(position, count)
+        group = self.random.choice(group_ids) if (
+            group_ids and self.random.random() < 0.7) else None
+        return Post(
+            author_id=self.random.choices(user_ids, cum_weights=weights)[0],
+            group_id=group,
+            text=self.text(self.random.randint(1, 6)),
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+
+    def follows(self, count, user_ids):
+        weights = self.popularity(user_ids)
+        per_user = max(count // len(user_ids), 1)
+
+        def rows():
+            created = 0
+            for user_id in user_ids:
+                authors = set()
+                # У популярных авторов выборка с повторами: добираем.
+                for _ in range(3):
+                    authors.update(self.random.choices(
+                        user_ids, cum_weights=weights,
+                        k=per_user - len(authors)))
+                    authors.discard(user_id)
+                    if len(authors) >= per_user:
+                        break
+                for author_id in authors:
+                    if created >= count:
+                        return
+                    created += 1
+                    yield Follow(user_id=user_id, author_id=author_id)
+        self.insert(Follow, rows(), count)
+
+    def comments(self, count, user_ids, post_range):
+        first, last = post_range['first'], post_range['last']
+        if first is None:
+            return
+        total = last - first + 1
+
+        def comment(_):
+            post_id = self.random.randint(first, last)
+            created = min(
+                self.date_at(post_id - first, total)
+                + timedelta(hours=self.random.random() * 24),
+                self.now,
+            )
+            return Comment(
+                post_id=post_id,
+                author_id=self.random.choice(user_ids),
+                text=self.text(1),
+                created=created,
+            )
+        with keep_dates(*date_fields()):
+            self.insert(Comment, map(comment, range(count)), count)
+
+    def finish(self, user_ids, timeline_users, index_search):
+        self.log('Пересчёт счётчиков')
+        with transaction.atomic():
+            counters.reconcile()
+        self.log('Пересчёт оценок популярности')
+        popular.rescore(Post.objects.all())
+        self.log('Заполнение лент подписок')
+        follows = Follow.objects.filter(
+            user_id__in=user_ids[:timeline_users]
+        ).order_by('pk').values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            with transaction.atomic():
+                timeline.backfill_follow(user_id, author_id)
+        if index_search:
+            self.log('Построение поискового индекса')
+            with transaction.atomic():
+                search.rebuild(Post, Comment, batch_size=self.batch_size)
+
+    def run(self, users, groups, posts, follows, comments,
+            timeline_users=100, index_search=True):
+        user_ids = self.users(users)
+        group_ids = self.groups(groups)
+        post_range = self.posts(posts, user_ids, group_ids)
+        self.follows(follows, user_ids)
+        self.comments(comments, user_ids, post_range)
+        self.finish(user_ids, timeline_users, index_search)
+        return user_ids
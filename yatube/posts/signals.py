@@ -0,0 +1,113 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import conditional, fragments, search, snapshots, tasks, thumbnails
+from .models import (Comment, Follow, Group, Notification, Post, User,
+                     UserStats)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_before_save(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежнюю группу: при её смене переносим счётчик и пост
+    # между снимками лент групп.
+    instance._old_group_id = None
+    if instance.pk and not raw:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    fragments.invalidate_index()
+    tasks.schedule_index_post(instance.pk)
+    if instance.image:
+        thumbnails.prepare(instance.image.name)
+    if created:
+        tasks.schedule_counter('user', instance.author_id, 'posts_count', 1)
+        tasks.schedule_counter('group', instance.group_id, 'posts_count', 1)
+        tasks.schedule_fan_out(instance.pk)
+        tasks.schedule_score(instance.pk)
+        snapshots.add_post(instance.group_id, instance.pub_date, instance.pk)
+        return
+    if instance._old_group_id != instance.group_id:
+        tasks.schedule_counter(
+            'group', instance._old_group_id, 'posts_count', -1)
+        tasks.schedule_counter('group', instance.group_id, 'posts_count', 1)
+        snapshots.remove_post(instance._old_group_id, instance.pk)
+        snapshots.add_post(instance.group_id, instance.pub_date, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    fragments.invalidate_index()
+    snapshots.remove_post(instance.group_id, instance.pk)
+    conditional.touch(
+        'index', ('group', instance.group_id),
+        ('author', instance.author_id), ('post', instance.pk))
+    search.remove_documents([search.doc_id(search.POST, instance.pk)])
+    tasks.schedule_counter('user', instance.author_id, 'posts_count', -1)
+    tasks.schedule_counter('group', instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    tasks.schedule_index_comment(instance.pk)
+    if created:
+        tasks.schedule_counter('post', instance.post_id, 'comments_count', 1)
+        tasks.schedule_notify_comment(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    conditional.touch(('post', instance.post_id))
+    search.remove_documents([search.doc_id(search.COMMENT, instance.pk)])
+    tasks.schedule_counter('post', instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        conditional.touch(
+            ('follow', instance.user_id), ('author', instance.author_id))
+        tasks.schedule_counter(
+            'user', instance.author_id, 'followers_count', 1)
+        tasks.schedule_counter('user', instance.user_id, 'following_count', 1)
+        tasks.schedule_sync_follow(instance.user_id, instance.author_id)
+        tasks.schedule_notify_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    conditional.touch(
+        ('follow', instance.user_id), ('author', instance.author_id))
+    tasks.schedule_counter('user', instance.author_id, 'followers_count', -1)
+    tasks.schedule_counter('user', instance.user_id, 'following_count', -1)
+    tasks.schedule_sync_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # Каскад от комментария, поста или подписки: непрочитанное могло
+    # уйти вместе с ним.
+    tasks.schedule_recount_unread(instance.recipient_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, raw=False, **kwargs):
+    # Название и адрес группы выводятся в карточке поста на любой ленте,
+    # а правят группы редко: здесь уместна общая метка.
+    if not raw:
+        conditional.touch()
@@ -0,0 +1,161 @@
+"""
+Снимки лент групп.
+
+Снимок группы — список ключей (pub_date, id) последних
+GROUP_SNAPSHOT_SIZE постов в кэше. Сигналы правят его после коммита
+записи: новый пост вставляется, удалённый или перенесённый в другую
+группу убирается, так что снимок не сбрасывается на каждый пост. Страницы в
+пределах снимка берут id из него, а сами посты — из posts.caches.
+Страницы глубже снимка читаются из базы как обычно.
+"""
+import bisect
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core import tasks
+from core.cache import (LOCK_ATTEMPTS, LOCK_TIMEOUT, LOCK_WAIT,
+                        get_or_compute)
+from core.paginator import CursorPaginator
+from .caches import get_posts
+from .models import Post
+
+SNAPSHOT_KEY = 'group:{}:snapshot'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def snapshot_key(group_id):
+    return SNAPSHOT_KEY.format(group_id)
+
+
+def invalidate_groups(group_ids):
+    cache.delete_many([snapshot_key(pk) for pk in group_ids])
+
+
+def build_snapshot(group_id):
+    """
+    Ключи по убыванию и признак полноты: снимок полный, если в группе
+    не больше постов, чем в нём.
+    """
+    size = settings.GROUP_SNAPSHOT_SIZE
+    # Снимок живёт в кэше GROUP_SNAPSHOT_TIMEOUT, а add_post правит только
+    # уже собранный: собранный с отстающей реплики терял бы свежие посты.
+    posts = Post.objects.using(DEFAULT_DB_ALIAS).filter(group_id=group_id)
+    entries = list(posts.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk')[:size + 1])
+    return entries[:size], len(entries) <= size
+
+
+def get_snapshot(group_id):
+    return get_or_compute(
+        snapshot_key(group_id),
+        lambda: build_snapshot(group_id),
+        settings.GROUP_SNAPSHOT_TIMEOUT,
+    )
+
+
+def _lock(lock):
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            return True
+        time.sleep(LOCK_WAIT)
+    return False
+
+
+def _edit(group_id, change):
+    """
+    Правит снимок после коммита записи: откат не оставит в нём лишнего
+    id. Правка идёт под блокировкой, которую берёт и пересчёт снимка в
+    get_or_compute, и ждёт его конца: пересчёт, прочитавший базу до
+    коммита, иначе затёр бы правку. Не дождались — снимок удаляется и
+    соберётся заново.
+    """
+    if group_id is not None:
+        tasks.on_commit(lambda: _apply(group_id, change))
+
+
+def _apply(group_id, change):
+    key = snapshot_key(group_id)
+    lock = f'{key}:lock'
+    if not _lock(lock):
+        cache.delete(key)
+        return
+    try:
+        entry = cache.get(key)
+        if entry is None:
+            return
+        (entries, complete), delta, expires_at = entry
+        entries, complete = change(list(entries), complete)
+        cache.set(key, ((entries, complete), delta, expires_at),
+                  settings.GROUP_SNAPSHOT_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def _descending(entry):
+    """Ключ сортировки снимка по возрастанию; целые микросекунды точны."""
+    pub_date, pk = entry
+    return (-((pub_date - EPOCH) // MICROSECOND), -pk)
+
+
+def add_post(group_id, pub_date, post_id):
+    def change(entries, complete):
+        entry = (pub_date, post_id)
+        if entry in entries:
+            return entries, complete
+        keys = [_descending(item) for item in entries]
+        position = bisect.bisect(keys, _descending(entry))
+        if position == len(entries) and not complete:
+            # Старше всего снимка: его место среди постов за пределами.
+            return entries, complete
+        entries.insert(position, entry)
+        if len(entries) > settings.GROUP_SNAPSHOT_SIZE:
+            return entries[:settings.GROUP_SNAPSHOT_SIZE], False
+        return entries, complete
+    _edit(group_id, change)
+
+
+def remove_post(group_id, post_id):
+    def change(entries, complete):
+        return [item for item in entries if item[1] != post_id], complete
+    _edit(group_id, change)
+
+
+class SnapshotPaginator(CursorPaginator):
+    """CursorPaginator ленты группы, который читает id из снимка."""
+
+    def __init__(self, object_list, per_page, group_id, **options):
+        options.setdefault('hydrate', get_posts)
+        super().__init__(object_list, per_page, **options)
+        self.group_id = group_id
+
+    def fetch(self, values, backwards, limit):
+        entries, complete = get_snapshot(self.group_id)
+        keys = [_descending(item) for item in entries]
+        if values is None:
+            if backwards:
+                # Последняя страница: снимок годится, только если полный.
+                chosen = entries[:-limit - 1:-1] if complete else None
+            else:
+                chosen = entries[:limit]
+                if len(chosen) < limit and not complete:
+                    chosen = None
+        else:
+            position = _descending(values)
+            if backwards:
+                end = bisect.bisect_left(keys, position)
+                chosen = entries[max(end - limit, 0):end][::-1]
+                if end == len(entries) and not complete:
+                    chosen = None
+            else:
+                start = bisect.bisect_right(keys, position)
+                chosen = entries[start:start + limit]
+                if len(chosen) < limit and not complete:
+                    chosen = None
+        if chosen is None:
+            return super().fetch(values, backwards, limit)
+        return self.hydrate([pk for _, pk in chosen])
@@ -0,0 +1,130 @@
+"""
+Фоновые задачи постов: счётчики, поисковый индекс, ленты подписок,
+уведомления и оценки популярности.
+
+Задачи получают id, а не объекты, и перечитывают данные сами: к их
+запуску пост могли изменить или удалить, а подписку — отменить.
+"""
+from core.tasks import task
+from . import counters, notifications, popular, search, timeline
+from .models import Comment, Follow, Post
+
+
+@task(batch=True)
+def update_counters(calls):
+    applied = counters.apply(calls)
+    followers = {
+        pk: fields['followers_count']
+        for (kind, pk), fields in applied.items()
+        if kind == 'user' and 'followers_count' in fields
+    }
+    for author_id in timeline.unpulled_authors(followers):
+        backfill_author.delay(author_id, key=f'backfill-author:{author_id}')
+    # Оценка зависит от comments_count, поэтому ставится только после
+    # сдвига: пачки задач выполняются в порядке имён, а не постановки.
+    for (kind, pk), fields in applied.items():
+        if kind == 'post' and 'comments_count' in fields:
+            schedule_score(pk)
+
+
+@task(batch=True)
+def index_posts(calls):
+    posts = Post.objects.filter(
+        pk__in=[post_id for post_id, in calls]).values_list('pk', 'text')
+    search.index_documents([
+        (search.doc_id(search.POST, pk), pk, text) for pk, text in posts
+    ])
+
+
+@task(batch=True)
+def index_comments(calls):
+    comments = Comment.objects.filter(
+        pk__in=[comment_id for comment_id, in calls]
+    ).values_list('pk', 'post_id', 'text')
+    search.index_documents([
+        (search.doc_id(search.COMMENT, pk), post_id, text)
+        for pk, post_id, text in comments
+    ])
+
+
+@task
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'pub_date').first()
+    if post is not None:
+        timeline.fan_out_post(post)
+
+
+@task
+def sync_follow(user_id, author_id):
+    """Приводит ленту подписчика к текущему состоянию подписки."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill_follow(user_id, author_id)
+    else:
+        timeline.drop_follow(user_id, author_id)
+
+
+@task
+def backfill_author(author_id):
+    timeline.backfill_author(author_id)
+
+
+@task(batch=True)
+def score_posts(calls):
+    popular.rescore(Post.objects.filter(
+        pk__in=[post_id for post_id, in calls]))
+
+
+@task(batch=True)
+def notify_follows(calls):
+    notifications.deliver(notifications.collect(follows=calls, comments=[]))
+
+
+@task(batch=True)
+def recount_unread(calls):
+    counters.recount_unread({user_id for user_id, in calls})
+
+
+@task(batch=True)
+def notify_comments(calls):
+    notifications.deliver(notifications.collect(
+        follows=[], comments=[comment_id for comment_id, in calls]))
+
+
+def schedule_counter(kind, pk, field, delta):
+    """Сдвигает счётчик после коммита; у вызовов нет ключа — каждый важен."""
+    if pk is not None:
+        update_counters.delay(kind, pk, field, delta)
+
+
+def schedule_index_post(post_id):
+    index_posts.delay(post_id, key=f'search:post:{post_id}')
+
+
+def schedule_index_comment(comment_id):
+    index_comments.delay(comment_id, key=f'search:comment:{comment_id}')
+
+
+def schedule_fan_out(post_id):
+    fan_out_post.delay(post_id, key=f'fan-out:{post_id}')
+
+
+def schedule_sync_follow(user_id, author_id):
+    sync_follow.delay(user_id, author_id, key=f'follow:{user_id}:{author_id}')
+
+
+def schedule_score(post_id):
+    score_posts.delay(post_id, key=f'score:{post_id}')
+
+
+def schedule_notify_follow(user_id, author_id):
+    notify_follows.delay(
+        user_id, author_id, key=f'notify:follow:{user_id}:{author_id}')
+
+
+def schedule_notify_comment(comment_id):
+    notify_comments.delay(comment_id, key=f'notify:comment:{comment_id}')
+
+
+def schedule_recount_unread(user_id):
+    recount_unread.delay(user_id, key=f'unread:{user_id}')
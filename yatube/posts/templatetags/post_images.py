@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(image):
+    """Варианты превью для <picture> или заглушка; в запросе не режет."""
+    if not image:
+        return None
+    return thumbnails.image_variants(image.name)
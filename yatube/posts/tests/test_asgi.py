@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import WsgiToAsgi
+from posts import benchmark
+from posts.models import Post, User
+
+
+class AsgiTest(TransactionTestCase):
+    """Запросы идут через yatube.asgi в потоках пула, как на сервере."""
+
+    def setUp(self):
+        cache.clear()
+        self.wsgi = get_wsgi_application()
+        self.application = WsgiToAsgi(self.wsgi, threads=2)
+        self.author = User.objects.create_user(username='author')
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        client = Client()
+        client.force_login(self.author)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}=' + (
+            client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    def tearDown(self):
+        # Закрываем соединения потоков пула до очистки базы.
+        self.application.executor.submit(connections.close_all).result()
+        self.application.executor.shutdown()
+
+    def request(self, url, method='GET', body=b'', headers=(), cookie=''):
+        path, _, query = url.partition('?')
+        scope = benchmark.http_scope(url, self.cookie + cookie)
+        scope.update(method=method, query_string=query.encode(), path=path)
+        scope['headers'] += list(headers)
+        chunks = [body[:5], body[5:]]
+        messages = []
+
+        async def receive():
+            chunk = chunks.pop(0)
+            return {'type': 'http.request', 'body': chunk,
+                    'more_body': bool(chunks)}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.application(scope, receive, send))
+        return messages
+
+    def test_get(self):
+        """Обычный ответ уходит двумя сообщениями: заголовки и тело"""
+        start, body = self.request(reverse('posts:index'))
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'),
+                      start['headers'])
+        self.assertIn('Пост 2', body['body'].decode())
+        self.assertFalse(body.get('more_body'))
+
+    def test_post_body(self):
+        """Тело запроса из нескольких сообщений доходит до формы"""
+        token = 'a' * 64
+        messages = self.request(
+            reverse('posts:post_create'), method='POST',
+            body=f'text=ASGI&csrfmiddlewaretoken={token}'.encode(),
+            headers=[(b'content-type', b'application/x-www-form-urlencoded')],
+            cookie=f'; {settings.CSRF_COOKIE_NAME}={token}')
+        self.assertEqual(messages[0]['status'], 302)
+        self.assertTrue(Post.objects.filter(text='ASGI').exists())
+
+    def test_streaming(self):
+        """Потоковый ответ отправляется по кускам"""
+        url = reverse('posts:profile_export')
+        messages = self.request(f'{url}?format=jsonl')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertTrue(messages[1]['more_body'])
+        self.assertFalse(messages[-1].get('more_body'))
+        body = b''.join(message['body'] for message in messages[1:])
+        self.assertEqual(len(body.decode().splitlines()), 3)
+        self.assertEqual(json.loads(body.splitlines()[0])['type'], 'posts')
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки"""
+        incoming = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        application = WsgiToAsgi(self.wsgi, threads=1)
+        asyncio.run(application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+    def test_serving_benchmark(self):
+        """Замер ёмкости проходит для WSGI и ASGI"""
+        scope = benchmark.http_scope(reverse('posts:index'), self.cookie)
+        wsgi = benchmark.serve_wsgi(self.wsgi, scope, 3, 2, 2, 0)
+        asgi = benchmark.serve_asgi(self.application, scope, 3, 2, 0)
+        self.assertEqual(wsgi['requests'], 6)
+        self.assertEqual(asgi['requests'], 6)
@@ -0,0 +1,90 @@
+import threading
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+
+from posts import benchmark
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+from posts.seeding import Seeder
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_ids = Seeder(batch_size=16, seed=1).run(
+            users=6, groups=2, posts=40, follows=12, comments=30,
+            timeline_users=6,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seeding(self):
+        """Набор данных создаётся пачками вместе со счётчиками и лентами"""
+        self.assertEqual(len(self.user_ids), 6)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            UserStats.objects.aggregate(total=Sum('posts_count'))['total'],
+            40
+        )
+        first, last = Post.objects.order_by('pk')[::39]
+        self.assertLess(first.pub_date, last.pub_date)
+
+    def test_run(self):
+        """Замер проходит все сценарии и убирает созданные посты"""
+        reader = benchmark.default_reader()
+        results = benchmark.run(reader, requests=2, warmup=1)
+        self.assertEqual(
+            set(results['scenarios']), set(benchmark.SCENARIOS))
+        for name, row in results['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertGreater(row['queries'], 0)
+                self.assertGreater(row['rps'], 0)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(results['database_settings']['vendor'], 'sqlite')
+
+    def test_compare(self):
+        """Ухудшение сверх порога отмечается как регрессия"""
+        baseline = {'scenarios': {'index': {
+            'p50_ms': 10, 'p99_ms': 20, 'queries': 3, 'rps': 100}}}
+        results = {'scenarios': {'index': {
+            'p50_ms': 15, 'p99_ms': 21, 'queries': 3, 'rps': 95}}}
+        regressions = {
+            row[1] for row in benchmark.compare(results, baseline, 20)
+            if row[-1]
+        }
+        self.assertEqual(regressions, {'p50_ms'})
+
+
+class FakeScenario:
+    name = 'fake'
+    url = '/fake/'
+
+    def __init__(self):
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def send(self, client):
+        with self.lock:
+            self.sent += 1
+            if self.sent % 5 == 0:
+                raise OperationalError('database is locked')
+
+
+class ConcurrentMeasureTest(SimpleTestCase):
+    def test_threads(self):
+        """Запросы делятся между потоками, ошибки базы считаются"""
+        scenario = FakeScenario()
+        row = benchmark.measure(
+            lambda: None, scenario, requests=19, warmup=1, threads=4)
+        self.assertEqual(scenario.sent, 20)
+        self.assertEqual(row['threads'], 4)
+        self.assertEqual(row['errors'], 4)
+        self.assertGreater(row['rps'], 0)
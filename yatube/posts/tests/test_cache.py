@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import metrics
+from core.cache import get_or_compute
+from posts import fragments
+from posts.models import Post, User
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_value_is_computed_once(self):
+        """Значение вычисляется один раз и берётся из кэша"""
+        compute = mock.Mock(return_value=42)
+        self.assertEqual(get_or_compute('key', compute, 60), 42)
+        self.assertEqual(get_or_compute('key', compute, 60), 42)
+        compute.assert_called_once()
+        self.assertEqual(metrics.snapshot()['cache_hits'], 1)
+
+    def test_locked_key_returns_stale_value(self):
+        """Пока другой процесс пересчитывает, отдаётся старое значение"""
+        cache.set('key', ('старое', 1.0, 0), 60)
+        cache.add('key:lock', 1)
+        compute = mock.Mock(return_value='новое')
+        self.assertEqual(get_or_compute('key', compute, 60), 'старое')
+        compute.assert_not_called()
+
+    def test_expiring_value_is_recomputed_early(self):
+        """Истекающее значение пересчитывается заранее"""
+        cache.set('key', ('старое', 1.0, 0), 60)
+        compute = mock.Mock(return_value='новое')
+        self.assertEqual(get_or_compute('key', compute, 60), 'новое')
+        self.assertIsNone(cache.get('key:lock'))
+
+
+class IndexPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Первый', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_page_is_cached(self):
+        """Первая страница главной не ходит в базу за постами повторно"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        # Остаётся только однострочный запрос даты изменения ленты.
+        post_queries = [
+            query['sql'] for query in queries if 'posts_post' in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('LIMIT 1', post_queries[0])
+
+    def test_new_post_invalidates_first_page(self):
+        """Новый пост сразу появляется на закэшированной главной"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        post = Post.objects.create(text='Второй', author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'][0], post)
+
+
+@override_settings(TASKS_BACKEND='db')
+class IndexInvalidationCommitTest(TransactionTestCase):
+    def test_first_page_dropped_after_commit(self):
+        """Первая страница сбрасывается после коммита, а не до него"""
+        author = User.objects.create_user(username='author')
+        cache.set(fragments.INDEX_PAGE_KEY, 'страница')
+        with transaction.atomic():
+            Post.objects.create(text='Новый', author=author)
+            self.assertEqual(cache.get(fragments.INDEX_PAGE_KEY), 'страница')
+        self.assertIsNone(cache.get(fragments.INDEX_PAGE_KEY))
@@ -0,0 +1,32 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.db import database_settings
+
+
+class SqlitePragmasTest(TestCase):
+    def new_connection(self):
+        copy = connection.copy()
+        self.addCleanup(copy.close)
+        return copy
+
+    def pragma(self, conn, name):
+        with conn.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение SQLite получает PRAGMA из настроек"""
+        conn = self.new_connection()
+        # 1 — synchronous=NORMAL.
+        self.assertEqual(self.pragma(conn, 'synchronous'), 1)
+        self.assertEqual(self.pragma(conn, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(conn, 'temp_store'), 2)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_settings(self):
+        """PRAGMA берутся из SQLITE_PRAGMAS и попадают в отчёт"""
+        conn = self.new_connection()
+        self.assertEqual(
+            database_settings(conn),
+            {'vendor': 'sqlite', 'conn_max_age': 60, 'busy_timeout': 1234})
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def read_jsonl(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+        cls.foreign_post = Post.objects.create(
+            author=cls.reader, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.foreign_post, author=cls.author, text='Мой комментарий')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Чужой комментарий')
+        Follow.objects.create(user=cls.author, author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def download(self, **params):
+        response = self.client.get(reverse('posts:profile_export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_zip(self):
+        """Zip содержит разделы и картинки только своего пользователя"""
+        response, data = self.download()
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('yatube-author.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertIsNone(archive.testzip())
+        posts = read_jsonl(archive.read('posts.jsonl'))
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(posts[0]['text'], self.post.text)
+        self.assertEqual(posts[0]['group'], self.group.slug)
+        self.assertEqual(archive.read(posts[0]['image']), SMALL_GIF)
+        comments = read_jsonl(archive.read('comments.jsonl'))
+        self.assertEqual(
+            [comment['text'] for comment in comments], ['Мой комментарий'])
+        self.assertEqual(
+            read_jsonl(archive.read('following.jsonl')),
+            [{'username': 'reader'}])
+        self.assertEqual(
+            read_jsonl(archive.read('followers.jsonl')),
+            [{'username': 'reader'}])
+
+    def test_zip_skips_missing_image(self):
+        """Пропавший файл картинки не ломает архив"""
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, self.post.image.name))
+        _, data = self.download()
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ['comments.jsonl', 'followers.jsonl', 'following.jsonl',
+             'posts.jsonl'])
+
+    def test_jsonl(self):
+        """JSONL помечает записи разделом"""
+        response, data = self.download(format='jsonl')
+        self.assertIn('yatube-author.jsonl', response['Content-Disposition'])
+        types = [record['type'] for record in read_jsonl(data)]
+        self.assertEqual(
+            types, ['posts', 'comments', 'following', 'followers'])
+
+    def test_anonymous_redirect(self):
+        """Гостя отправляют на страницу входа"""
+        response = Client().get(reverse('posts:profile_export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command(self):
+        """Команда export_user пишет архив в файл"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'author.jsonl')
+        call_command('export_user', 'author', output=output,
+                     format='jsonl', stdout=StringIO())
+        with open(output, 'rb') as source:
+            self.assertEqual(len(read_jsonl(source.read())), 4)
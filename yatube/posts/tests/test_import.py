@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class ImportMixin:
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def write_csv(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(text)
+        return path
+
+    def import_data(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_data', stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+
+class ImportDataTest(ImportMixin, TestCase):
+    def test_import(self):
+        """Импорт создаёт записи, пользователей и досчитывает счётчики"""
+        groups = self.write_csv(
+            'groups.csv', 'slug,title,description\ncats,Коты,Про котов\n')
+        posts = self.write_jsonl('posts.jsonl.gz', [
+            {'id': 10, 'author': 'leo', 'group': 'cats', 'text': 'Кот',
+             'pub_date': '2020-01-02T10:00:00'},
+            {'id': 11, 'author': 'leo', 'text': 'Без группы'},
+            {'author': 'leo'},
+        ])
+        comments = self.write_jsonl('comments.jsonl', [
+            {'post': 10, 'author': 'anna', 'text': 'Мяу'},
+            {'post': 999, 'author': 'anna', 'text': 'Нет поста'},
+        ])
+        follows = self.write_csv(
+            'follows.csv', 'user,author\nanna,leo\nleo,leo\n')
+        self.import_data(
+            groups=groups, posts=posts, comments=comments, follows=follows)
+
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Group.objects.get(slug='cats').posts_count, 1)
+        leo = User.objects.get(username='leo')
+        self.assertFalse(leo.has_usable_password())
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='anna').count(), 2)
+
+    def test_import_is_repeatable(self):
+        """Повторный импорт того же файла не создаёт дубликатов"""
+        follows = self.write_jsonl('follows.jsonl', [
+            {'user': 'anna', 'author': 'leo'}])
+        self.import_data(follows=follows)
+        output, _ = self.import_data(follows=follows)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn('follows: загружено 0, пропущено 1', output)
+
+    def test_unknown_groups_reported(self):
+        """Посты с неизвестной группой загружаются, а slug — в отчёте"""
+        posts = self.write_jsonl('posts.jsonl', [
+            {'author': 'leo', 'group': 'nowhere', 'text': 'Пост'}])
+        _, errors = self.import_data(posts=posts)
+        self.assertIsNone(Post.objects.get().group)
+        self.assertIn('nowhere', errors)
+
+    def test_failed_import_finishes_committed_chunks(self):
+        """Ошибка посреди файла не оставляет закоммиченное недосчитанным"""
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(json.dumps({'author': 'leo', 'text': 'Пост'}) + '\n')
+            output.write('{битая строка\n')
+        with self.assertRaises(CommandError):
+            self.import_data(posts=path, chunk_size=1)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(
+            User.objects.get(username='leo').stats.posts_count, 1)
+
+    def test_unknown_format(self):
+        """Неизвестный формат файла — ошибка команды"""
+        path = self.write_csv('posts.xml', '<posts/>')
+        with self.assertRaises(CommandError):
+            self.import_data(posts=path)
+
+
+class DeferredIndexesImportTest(ImportMixin, TransactionTestCase):
+    def index_names(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        return set(constraints)
+
+    def test_indexes_are_rebuilt(self):
+        """Отложенные индексы постов создаются заново после загрузки"""
+        before = self.index_names()
+        posts = self.write_jsonl('posts.jsonl', [
+            {'author': 'leo', 'text': f'Пост {number}'}
+            for number in range(5)
+        ])
+        call_command(
+            'import_data', posts=posts, defer_indexes=True,
+            chunk_size=2, batch_size=2, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(self.index_names(), before)
+        self.assertIn('post_pub_date_idx', before)
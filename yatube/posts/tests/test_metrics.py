@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        """В отладке метрики запроса отдаются заголовком Server-Timing"""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for part in ('db;dur=', 'SQL x', 'tpl;dur=', 'cache;', 'total;dur='):
+            with self.subTest(part=part):
+                self.assertIn(part, timing)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_no_server_timing_in_production(self):
+        """Без отладки заголовка Server-Timing нет"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_metrics_by_view(self):
+        """Итоги копятся по имени view"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.get(url)
+        stats = metrics.views_snapshot()['posts:index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['sql_queries'], 0)
+        self.assertGreater(stats['db_seconds'], 0)
+        self.assertGreater(stats['template_seconds'], 0)
+        self.assertGreater(stats['cache_hits'], 0)
+
+    def test_prometheus_endpoint(self):
+        """/metrics/ отдаёт текстовый формат Prometheus только своим"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response,
+            'yatube_view_duration_seconds_count{view="posts:index"} 1'
+        )
+        self.assertContains(response, 'yatube_view_sql_queries_total')
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        """Медленный запрос пишется в лог вместе с SQL"""
+        with self.assertLogs('core.requests', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
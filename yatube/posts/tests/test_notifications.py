@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from posts import counters, notifications
+from posts.models import Comment, Follow, Notification, Post, User, UserStats
+
+
+class NotificationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', email='author@yatube.local')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост автора')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def unread(self):
+        return UserStats.objects.get(user=self.author).unread_notifications
+
+    def comment(self, author, text='Комментарий'):
+        return Comment.objects.create(post=self.post, author=author, text=text)
+
+    def test_follow_and_comment_notify_author(self):
+        """Подписка и комментарий приходят автору и видны в шапке"""
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Отличный пост'})
+        kinds = list(Notification.objects.filter(
+            recipient=self.author, actor=self.reader
+        ).values_list('kind', flat=True))
+        self.assertEqual(kinds, [Notification.COMMENT, Notification.FOLLOW])
+        self.assertEqual(self.unread(), 2)
+        response = self.author_client.get(reverse('posts:notifications'))
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertContains(response, 'подписался на вас')
+        self.assertContains(response, '<span class="badge bg-danger">2</span>')
+
+    def test_own_comment_is_not_notified(self):
+        """Комментарий к своему посту не создаёт уведомления"""
+        self.comment(self.author)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.unread(), 0)
+
+    def test_mark_read_keeps_later_notifications(self):
+        """Отметка прочитанным не гасит пришедшее после неё"""
+        self.comment(self.reader)
+        self.author_client.post(reverse('posts:notifications_read'))
+        self.assertEqual(self.unread(), 0)
+        self.comment(self.reader)
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(
+            self.author_client.get(reverse('posts:notifications_read'))
+            .status_code, 405)
+
+    def test_cascade_delete_decrements_unread(self):
+        """Удалённые каскадом уведомления уходят из счётчика"""
+        first = self.comment(self.reader)
+        self.author_client.post(reverse('posts:notifications_read'))
+        second = self.comment(self.reader)
+        self.assertEqual(self.unread(), 1)
+        first.delete()
+        self.assertEqual(self.unread(), 1)
+        second.delete()
+        self.assertEqual(self.unread(), 0)
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.author)
+        self.assertEqual(self.unread(), 1)
+        follower.delete()
+        self.assertEqual(self.unread(), 0)
+
+    def test_counter_changes_page_validator(self):
+        """Новое уведомление меняет ETag страницы: шапка не устаревает"""
+        url = reverse('posts:index')
+        etag = self.author_client.get(url)['ETag']
+        self.comment(self.reader)
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reconcile_fixes_unread_counter(self):
+        """reconcile пересчитывает непрочитанные после метки"""
+        self.comment(self.reader)
+        UserStats.objects.filter(user=self.author).update(
+            unread_notifications=7)
+        counters.reconcile()
+        self.assertEqual(self.unread(), 1)
+
+    @override_settings(TASKS_BACKEND='db')
+    def test_events_are_delivered_in_batch(self):
+        """Очередь доставляет пачку событий одной вставкой и одним UPDATE"""
+        for number in range(3):
+            self.comment(self.reader, text=str(number))
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.unread(), 0)
+        tasks.run_pending()
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertEqual(self.unread(), 4)
+
+    def test_digest_coalesces_events(self):
+        """Одна сводка на пользователя за интервал, без адреса — ни одной"""
+        for number in range(3):
+            self.comment(self.reader, text=f'Комментарий {number}')
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(notifications.send_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@yatube.local'])
+        self.assertIn('Комментарий 2', mail.outbox[0].body)
+
+        self.comment(self.reader, text='Позже')
+        self.assertEqual(notifications.send_digests(), 0)
+        later = timezone.now() + timedelta(hours=2)
+        self.assertEqual(notifications.send_digests(later), 1)
+        self.assertIn('Позже', mail.outbox[1].body)
+        self.assertNotIn('Комментарий 2', mail.outbox[1].body)
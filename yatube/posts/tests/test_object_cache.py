@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import caches
+from posts.models import Comment, Group, Post, User
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_get_many_loads_misses_in_one_query(self):
+        """Промахи страницы читаются одним запросом IN"""
+        ids = [post.pk for post in self.posts]
+        caches.posts.get_many(ids[:2])
+        with CaptureQueriesContext(connection) as queries:
+            found = caches.posts.get_many(ids + [10 ** 6])
+        self.assertEqual(len(queries), 1)
+        self.assertIn(' IN (', queries[0]['sql'])
+        self.assertEqual(sorted(found), ids)
+        with CaptureQueriesContext(connection) as queries:
+            caches.posts.get_many(ids)
+        self.assertEqual(len(queries), 0)
+
+    def test_hydrated_posts_follow_author_and_group(self):
+        """Посты собираются с автором и группой из их кэшей"""
+        post = self.posts[0]
+        caches.get_post(post.pk)
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        self.group.title = 'Новое название'
+        self.group.save()
+        hydrated = caches.get_post(post.pk)
+        self.assertEqual(hydrated.author.first_name, 'Новое имя')
+        self.assertEqual(hydrated.group.title, 'Новое название')
+
+    def test_lookup_by_username_survives_rename(self):
+        """Переименование сбрасывает кэш по старому username"""
+        user = User.objects.create_user(username='old')
+        self.assertEqual(caches.users.get_by('username', 'old'), user)
+        with CaptureQueriesContext(connection) as queries:
+            caches.users.get_by('username', 'old')
+        self.assertEqual(len(queries), 0)
+        user.username = 'new'
+        user.save()
+        self.assertIsNone(caches.users.get_by('username', 'old'))
+        self.assertEqual(caches.users.get_by('username', 'new'), user)
+
+    def test_users_cached_without_private_fields(self):
+        """В кэш пользователей не попадают пароль и почта"""
+        user = User.objects.create_user(
+            username='private', email='private@example.com', password='pass')
+        caches.users.get_by('username', 'private')
+        cached = cache.get(caches.users.key(user.pk))
+        self.assertEqual(cached.username, 'private')
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('email', cached.__dict__)
+
+    def test_counter_updates_refresh_cached_objects(self):
+        """Счётчики, сдвинутые через update(), не залипают в кэше"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        Post.objects.create(author=self.author, group=self.group, text='Ещё')
+        response = self.client.get(url)
+        self.assertEqual(response.context['group'].posts_count, 6)
+
+        post = self.posts[0]
+        caches.get_post(post.pk)
+        Comment.objects.create(post=post, author=self.author, text='Текст')
+        self.assertEqual(caches.get_post(post.pk).comments_count, 1)
+
+    def test_detail_pages_read_objects_from_cache(self):
+        """Повторные post_detail и profile не читают пост и автора из базы"""
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.posts[0].pk}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                user_queries = [
+                    query for query in queries
+                    if query['sql'].startswith('SELECT "auth_user"')
+                ]
+                self.assertEqual(user_queries, [])
+
+    def test_missing_objects_give_404(self):
+        """Несуществующие пост, группа и пользователь — 404"""
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}),
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(TASKS_BACKEND='db')
+class ObjectCacheCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_waits_for_commit(self):
+        """Запись удаляется после коммита, а не до него"""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Старый')
+        stale = caches.posts.get(post.pk)
+        with transaction.atomic():
+            post.text = 'Новый'
+            post.save()
+            # Параллельный запрос до коммита кладёт в кэш прежнюю строку.
+            cache.set(caches.posts.key(post.pk), stale)
+        self.assertEqual(caches.get_post(post.pk).text, 'Новый')
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from posts import popular
+from posts.models import Comment, Follow, Post, User
+
+
+class PopularFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.discussed = Post.objects.create(
+            author=cls.author, text='Обсуждаемый')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def ranked(self):
+        response = self.client.get(reverse('posts:popular'))
+        return list(response.context['page_obj'])
+
+    def comment(self, post):
+        return Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+
+    @override_settings(TASKS_BACKEND='db')
+    def test_score_counts_new_comment(self):
+        """Оценка пересчитывается после сдвига счётчика комментариев"""
+        tasks.run_pending()
+        self.comment(self.discussed)
+        while tasks.run_pending():
+            pass
+        post = Post.objects.get(pk=self.discussed.pk)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            popular.rescore(Post.objects.filter(pk=post.pk)), 0)
+
+    def test_comments_raise_post(self):
+        """Комментарии поднимают пост, удаление — опускает"""
+        self.quiet.pub_date = self.discussed.pub_date + timedelta(seconds=1)
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=self.quiet.pub_date)
+        popular.rescore(Post.objects.all())
+        self.assertEqual(self.ranked(), [self.quiet, self.discussed])
+
+        comment = self.comment(self.discussed)
+        cache.clear()
+        self.assertEqual(self.ranked(), [self.discussed, self.quiet])
+        comment.delete()
+        cache.clear()
+        self.assertEqual(self.ranked(), [self.quiet, self.discussed])
+
+    def test_score_decays_with_age(self):
+        """Пост на период полураспада старше весит как вдвое меньший отклик"""
+        now = timezone.now()
+        half_life = timedelta(seconds=60 * 60)
+        with self.settings(POPULAR_HALF_LIFE=half_life.total_seconds(),
+                           POPULAR_FOLLOWER_WEIGHT=0):
+            older, newer = popular.compute_scores(
+                [(now - half_life).timestamp(), now.timestamp()],
+                [3, 1], [0, 0])
+        self.assertAlmostEqual(older, newer)
+
+    def test_recompute_uses_follower_counts(self):
+        """Периодический пересчёт учитывает новых подписчиков автора"""
+        other = User.objects.create_user(username='other')
+        post = Post.objects.create(author=other, text='Свежий')
+        old_score = Post.objects.get(pk=post.pk).score
+        Follow.objects.create(user=self.reader, author=other)
+        with self.settings(POPULAR_FOLLOWER_WEIGHT=1):
+            out = StringIO()
+            call_command('recompute_popular', stdout=out)
+        self.assertIn('Изменено оценок', out.getvalue())
+        self.assertAlmostEqual(
+            Post.objects.get(pk=post.pk).score - old_score, 1)
+
+    def test_recompute_skips_old_posts(self):
+        """Посты старше окна не пересчитываются"""
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=timezone.now() - timedelta(days=30), score=0)
+        popular.recompute()
+        self.assertEqual(Post.objects.get(pk=self.quiet.pk).score, 0)
+
+    def test_scores_without_numpy(self):
+        """Без NumPy оценки считаются на чистом Python"""
+        args = ([popular.EPOCH + 3600, popular.EPOCH], [2, 0], [100, 0])
+        with mock.patch.object(popular, 'numpy', None):
+            self.assertEqual(len(popular.compute_scores(*args)), 2)
+            self.assertGreater(*popular.compute_scores(*args))
+
+    @skipIf(popular.numpy is None, 'NumPy не установлен')
+    def test_numpy_matches_pure_python(self):
+        """Векторный расчёт совпадает с расчётом на чистом Python"""
+        args = ([popular.EPOCH + 3600, popular.EPOCH], [2, 0], [100, 0])
+        vectorized = popular.compute_scores(*args)
+        with mock.patch.object(popular, 'numpy', None):
+            pure = popular.compute_scores(*args)
+        for fast, slow in zip(vectorized, pure):
+            self.assertAlmostEqual(fast, slow)
+
+    @override_settings(POPULAR_CACHE_TIMEOUT=60)
+    def test_first_page_is_cached(self):
+        """Первая страница отдаётся из кэша, как у главной"""
+        self.client.get(reverse('posts:popular'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:popular'))
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']])
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db import ReplicaRouter, routing
+from posts.models import Group, Post, User, UserStats
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """default и пустая replica: видно, из какой базы читает страница."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        # Реплика отстаёт: на ней есть автор, но ещё нет его поста.
+        User.objects.using('replica').create(
+            pk=self.author.pk, username='author',
+            password=self.author.password)
+        UserStats.objects.using('replica').create(user_id=self.author.pk)
+        self.post = Post.objects.create(author=self.author, text='Свежий пост')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_reads_from_replica(self):
+        """Страницы для чтения не видят записей, которых нет на реплике"""
+        # Первая страница главной кэшируется и потому собирается из
+        # default, см. test_cached_first_page_built_on_default.
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, self.post.text)
+        # Сам пост берётся из кэша объектов, а тот наполняется из default:
+        # отстающая реплика не кладёт в кэш старую версию.
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, self.post.text)
+
+    def test_group_snapshot_built_on_default(self):
+        """Снимок ленты группы собирается из default, а не с реплики"""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        post = Post.objects.create(
+            author=self.author, group=group, text='Пост группы')
+        response = Client().get(
+            reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertContains(response, post.text)
+
+    def test_cached_first_page_built_on_default(self):
+        """Закэшированная первая страница главной собирается из default"""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+
+    def test_sticky_after_write(self):
+        """После записи автор читает из default, пока жива cookie"""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'})
+        cookie = response.cookies[settings.REPLICA_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, self.post.text)
+
+    def test_reads_without_writes_not_sticky(self):
+        """Чтение страницы не закрепляет пользователя за default"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(settings.REPLICA_COOKIE, response.cookies)
+
+    def test_router_outside_requests(self):
+        """Вне запроса и до пометки read_replica всё идёт в default"""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        with routing() as state:
+            self.assertIsNone(router.db_for_read(Post))
+            state.replica = True
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            router.db_for_write(Post)
+            self.assertIsNone(router.db_for_read(Post))
+
+    @override_settings(REPLICA_DATABASES=['replica', 'replica_2'])
+    def test_one_replica_per_request(self):
+        """Все чтения одного запроса идут на одну реплику"""
+        router = ReplicaRouter()
+        with routing() as state:
+            state.replica = True
+            chosen = {router.db_for_read(Post) for _ in range(20)}
+        self.assertEqual(len(chosen), 1)
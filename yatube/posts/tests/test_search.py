@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.stemmer import stem
+from posts.models import Comment, Post, User
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Мои кошки любят спать на солнце')
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Собаки гуляют во дворе')
+        Comment.objects.create(
+            post=cls.dogs, author=cls.author, text='А у соседа живёт кошка')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_stemmer(self):
+        """Разные формы слова приводятся к одной основе"""
+        self.assertEqual(stem('кошками'), stem('кошка'))
+        self.assertEqual(stem('Ёжики'), 'ежик')
+
+    def test_search_uses_word_forms_and_ranks_posts_first(self):
+        """Поиск находит формы слова, совпадение в посте выше комментария"""
+        self.assertEqual(self.search('кошкам'), [self.cats, self.dogs])
+        self.assertEqual(self.search('собака'), [self.dogs])
+        self.assertEqual(self.search('кошки соседа'), [self.dogs])
+        self.assertEqual(self.search(''), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении"""
+        self.cats.text = 'Теперь про попугаев'
+        self.cats.save()
+        self.assertEqual(self.search('кошки'), [self.dogs])
+        self.assertEqual(self.search('попугай'), [self.cats])
+        self.dogs.comments.all().delete()
+        self.assertEqual(self.search('кошки'), [])
+
+    def test_search_pagination_keeps_query(self):
+        """Ссылки пагинации сохраняют поисковый запрос"""
+        for number in range(11):
+            Post.objects.create(author=self.author, text=f'Собака {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'собаки'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertContains(response, '?q=%D1%81%D0%BE%D0%B1%D0%B0%D0%BA')
+        self.assertEqual(len(self.search('собаки', page=2)), 2)
+
+    def test_rebuild_search_index_command(self):
+        """Команда rebuild_search_index восстанавливает индекс"""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('солнце'), [self.cats])
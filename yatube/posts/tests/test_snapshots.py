@@ -0,0 +1,135 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import snapshots
+from posts.models import Group, Post, User
+
+
+class GroupSnapshotTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(25)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def url(self, slug='group'):
+        return reverse('posts:group_list', kwargs={'slug': slug})
+
+    def page(self, cursor=None, slug='group'):
+        data = {'cursor': cursor} if cursor else {}
+        return self.client.get(self.url(slug), data).context['page_obj']
+
+    def snapshot_ids(self, group):
+        entries, _ = snapshots.get_snapshot(group.pk)
+        return [pk for _, pk in entries]
+
+    def expected(self, group):
+        return list(Post.objects.filter(group=group).order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+
+    def test_warm_page_skips_post_queries(self):
+        """Повторная страница группы берёт посты из кэша"""
+        self.page()
+        with CaptureQueriesContext(connection) as queries:
+            self.page()
+        post_queries = [
+            query['sql'] for query in queries if 'posts_post' in query['sql']
+        ]
+        # Остаётся только запрос даты изменения ленты для ETag.
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('LIMIT 1', post_queries[0])
+
+    @override_settings(GROUP_SNAPSHOT_SIZE=15)
+    def test_cursor_pages_match_database(self):
+        """Страницы по курсору из снимка и за ним совпадают с базой"""
+        seen = []
+        page = first = self.page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = self.page(page.paginator.next_cursor)
+        self.assertEqual(seen, self.expected(self.group))
+
+        back = self.page(page.paginator.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], self.expected(self.group)[10:20])
+        last = self.page(first.paginator.last_cursor)
+        self.assertEqual(
+            [post.pk for post in last], self.expected(self.group)[-10:])
+
+    def test_writes_update_snapshot_in_place(self):
+        """Создание, перенос и удаление правят снимок, а не сбрасывают его"""
+        self.page()
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый')
+        self.assertEqual(self.snapshot_ids(self.group)[0], post.pk)
+
+        self.page(slug='other')
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Перенесённый', 'group': self.other.pk})
+        self.assertNotIn(post.pk, self.snapshot_ids(self.group))
+        self.assertEqual(self.snapshot_ids(self.other), [post.pk])
+        self.assertEqual(self.page(slug='other')[0].text, 'Перенесённый')
+
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.snapshot_ids(self.other), [])
+        self.assertEqual(
+            self.snapshot_ids(self.group), self.expected(self.group))
+
+    def test_edit_refreshes_cached_post(self):
+        """Правка поста видна на закэшированной странице группы"""
+        post = self.posts[-1]
+        self.page()
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Исправленный', 'group': self.group.pk})
+        self.assertEqual(self.page()[0].text, 'Исправленный')
+
+
+@override_settings(TASKS_BACKEND='db')
+class GroupSnapshotCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def snapshot_ids(self):
+        entries, _ = snapshots.get_snapshot(self.group.pk)
+        return [pk for _, pk in entries]
+
+    def test_snapshot_changes_after_commit(self):
+        """Снимок правится после коммита, откат его не трогает"""
+        self.assertEqual(self.snapshot_ids(), [])
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Post.objects.create(
+                    author=self.author, group=self.group, text='Откаченный')
+                raise ValueError
+        self.assertEqual(self.snapshot_ids(), [])
+
+        with transaction.atomic():
+            post = Post.objects.create(
+                author=self.author, group=self.group, text='Новый')
+            self.assertEqual(self.snapshot_ids(), [])
+        self.assertEqual(self.snapshot_ids(), [post.pk])
@@ -0,0 +1,148 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import tasks
+from core.models import QueuedTask
+from posts import search
+from posts.models import Follow, Post, TimelineEntry, User, UserStats
+from posts.search import SearchResults
+
+calls = []
+
+
+@tasks.task(retries=1)
+def flaky(value):
+    calls.append(value)
+    raise ValueError(value)
+
+
+@override_settings(TASKS_BACKEND='db')
+class DatabaseQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_post_create_defers_side_effects(self):
+        """Пост сохраняется сразу, индекс и ленты — воркером"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.run_pending()
+        self.client.post(reverse('posts:post_create'), {'text': 'Отложенный'})
+        post = Post.objects.get(text='Отложенный')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            len(SearchResults('отложенный', Post.objects.all())), 0)
+
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            len(SearchResults('отложенный', Post.objects.all())), 1)
+
+    def test_idempotency_key(self):
+        """Повторные правки поста ставят одну индексацию"""
+        post = Post.objects.create(author=self.author, text='Первый')
+        for text in ('Второй', 'Третий'):
+            post.text = text
+            post.save()
+        self.assertEqual(QueuedTask.objects.filter(
+            key=f'search:post:{post.pk}').count(), 1)
+        tasks.run_pending()
+        self.assertEqual(len(SearchResults('третий', Post.objects.all())), 1)
+
+    def test_batching(self):
+        """Индексация нескольких постов идёт одним вызовом"""
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        with mock.patch.object(
+                search, 'index_documents',
+                wraps=search.index_documents) as index:
+            tasks.run_pending()
+        index.assert_called_once()
+        self.assertEqual(len(index.call_args[0][0]), 3)
+
+    def test_counters_applied_by_worker(self):
+        """Счётчики сдвигает воркер, одним UPDATE на строку за пачку"""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        tasks.run_pending()
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.followers_count, 0)
+        with CaptureQueriesContext(connection) as queries:
+            tasks.run_pending()
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "posts_userstats"')
+            and 'followers_count' in query['sql']
+        ]
+        self.assertEqual(len(updates), 1)
+        stats.refresh_from_db()
+        self.assertEqual(stats.followers_count, 3)
+
+    @override_settings(TASKS_RETRY_DELAY=0)
+    def test_retries(self):
+        """Упавшая задача повторяется, потом остаётся с ошибкой"""
+        calls.clear()
+        flaky.delay('boom', key='flaky')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_pending(), 1)
+        task = QueuedTask.objects.get(name=flaky.name)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('boom', task.error)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(tasks.run_pending(), 0)
+        task.refresh_from_db()
+        self.assertEqual(task.attempts, 2)
+        self.assertIsNone(task.key)
+        self.assertEqual(calls, ['boom', 'boom'])
+
+
+@override_settings(TASKS_WORKERS=1, TASKS_RETRY_DELAY=0)
+class ThreadQueueTest(SimpleTestCase):
+    def test_dedup_and_retries(self):
+        """Пул потоков не дублирует ждущие задачи и повторяет упавшие"""
+        backend = tasks.ThreadBackend()
+        started, release = threading.Event(), threading.Event()
+        finished = threading.Semaphore(0)
+
+        @tasks.task(retries=1)
+        def blocking():
+            started.set()
+            release.wait(5)
+            finished.release()
+
+        calls.clear()
+        backend.put(tasks.Job(blocking.name, [], 'block', 0, None))
+        self.assertTrue(started.wait(5))
+        with self.assertLogs('core.tasks', 'ERROR'):
+            for _ in range(2):
+                backend.put(tasks.Job(flaky.name, ['x'], 'flaky', 0, None))
+            release.set()
+            self.assertTrue(finished.acquire(timeout=5))
+            for _ in range(100):
+                if len(calls) == 2:
+                    break
+                time.sleep(0.05)
+        # Один вызов и один повтор: второй с тем же ключом не встал.
+        self.assertEqual(calls, ['x', 'x'])
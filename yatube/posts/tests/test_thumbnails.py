@@ -0,0 +1,94 @@
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import tasks
+from core.models import QueuedTask
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_BACKEND='db')
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_save_schedules_thumbnail(self):
+        """Сохранение поста ставит нарезку превью в фоновую очередь"""
+        task = QueuedTask.objects.get(name=thumbnails.generate.name)
+        self.assertEqual(json.loads(task.args), [self.post.image.name])
+        self.assertEqual(task.key, f'thumbnails:{self.post.image.name}')
+
+    def test_page_shows_placeholder_until_ready(self):
+        """Пока превью не готово, страница отдаёт заглушку"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with mock.patch.object(thumbnails, 'get_thumbnail') as get_thumb:
+            response = Client().get(url)
+        get_thumb.assert_not_called()
+        self.assertContains(response, thumbnails.PLACEHOLDER)
+
+        thumbnails.generate(self.post.image.name)
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, thumbnails.PLACEHOLDER)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_variants_in_webp_and_jpeg(self):
+        """Готовятся все ширины в WebP и запасном JPEG"""
+        thumbnails.generate(self.post.image.name)
+        image = thumbnails.image_variants(self.post.image.name)
+        self.assertTrue(image.ready)
+        self.assertEqual(image.sources[0][0], 'image/webp')
+        for width in thumbnails.VARIANT_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', image.sources[0][1])
+                self.assertIn(f' {width}w', image.fallback_srcset)
+        self.assertTrue(image.src.endswith('.jpg'))
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, '<source type="image/webp"')
+
+    @override_settings(TASKS_RETRY_DELAY=0)
+    def test_failed_generation_is_retried(self):
+        """Упавшая нарезка остаётся в очереди и удаётся при повторе"""
+        with mock.patch.object(
+                thumbnails, 'get_thumbnail', side_effect=OSError('диск')):
+            with self.assertLogs('core.tasks', 'ERROR'):
+                tasks.run_pending()
+        task = QueuedTask.objects.get(name=thumbnails.generate.name)
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNotNone(task.key)
+        tasks.run_pending()
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertTrue(thumbnails.image_variants(self.post.image.name).ready)
@@ -1,14 +1,19 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.conf import settings
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from posts.models import Follow, Group, Post, User
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -238,6 +243,41 @@ class PaginatorViewsTest(TestCase):
                     self.NUMBER_OF_POSTS_ON_SECOND_PAGE
                 )
 
+    def test_cursor_pagination(self):
+        """Переход по курсорам вперёд и назад на ленте index"""
+        url = reverse('posts:index')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        self.assertTrue(first_page.paginator.is_cursor)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        second_page = self.authorized_client.get(
+            url, {'cursor': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page),
+                         self.NUMBER_OF_POSTS_ON_SECOND_PAGE)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        seen = set(first_page) | set(second_page)
+        self.assertEqual(len(seen), self.NUMBER_OF_POSTS)
+        back_page = self.authorized_client.get(
+            url, {'cursor': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        last_page = self.authorized_client.get(
+            url, {'cursor': first_page.paginator.last_cursor}
+        ).context['page_obj']
+        self.assertFalse(last_page.has_next())
+        self.assertEqual(len(last_page),
+                         self.NUMBER_OF_POSTS_ON_FIRST_PAGE)
+        self.assertEqual(last_page[-1], second_page[-1])
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор ведёт на первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'})
+        self.assertEqual(len(response.context['page_obj']),
+                         self.NUMBER_OF_POSTS_ON_FIRST_PAGE)
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -332,6 +372,51 @@ class FollowViewsTest(TestCase):
                                       ).count()
         self.assertEqual(count, 1)
 
+    def test_unfollow_clears_timeline(self):
+        """После отписки посты автора пропадают из ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+        Follow.objects.filter(
+            user=self.follower, author=self.author).delete()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pulled_author_posts_in_timeline(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Без раздачи')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_limit_gets_fanned_out_again(self):
+        """Посты, написанные за пределом, раздаются после возврата под него"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='За пределом')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+        Follow.objects.filter(user=reader, author=self.author).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_backfill_timeline_command(self):
+        """Команда backfill_timeline восстанавливает ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+
 
 class CacheViewsTest(TestCase):
     @classmethod
@@ -348,20 +433,276 @@ class CacheViewsTest(TestCase):
         self.post_author.force_login(self.author)
         cache.clear()
 
-    def test_cache_index_page(self):
-        """Проверяем работу кэша"""
+    def test_cache_post_card(self):
+        """Карточка поста берётся из кэша до изменения поста"""
+        url = reverse('posts:index')
+        self.assertContains(self.post_author.get(url), self.post.text)
+        # Правка в обход save() не меняет версию — карточка из кэша.
+        Post.objects.filter(pk=self.post.pk).update(text='Без версии')
+        self.assertContains(self.post_author.get(url), self.post.text)
+        self.post_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактировано'},
+        )
+        response = self.post_author.get(url)
+        self.assertContains(response, 'Отредактировано')
+        self.assertNotContains(response, self.post.text)
+
+    def test_author_rename_visible_on_cached_card(self):
+        """Новое имя автора видно на закэшированных карточках сразу"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+        for url in urls:
+            self.post_author.get(url)
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.post_author.get(url), 'Автор: Переименованный')
+
+    def test_new_post_visible_without_cache_clear(self):
+        """Новый и удалённый посты видны на главной сразу"""
+        url = reverse('posts:index')
+        self.post_author.get(url)
         new_post = Post.objects.create(
             text='Тестируем кэш',
             author=self.author
         )
-        response_add = self.post_author.get(
-            reverse('posts:index')).content
+        self.assertContains(self.post_author.get(url), new_post.text)
         new_post.delete()
-        response_delete = self.post_author.get(
-            reverse('posts:index')).content
-        self.assertEqual(response_add, response_delete)
+        self.assertNotContains(self.post_author.get(url), new_post.text)
+
+    def test_header_is_not_shared_between_users(self):
+        """Шапка страницы не кэшируется для всех пользователей"""
+        url = reverse('posts:index')
+        self.post_author.get(url)
+        response = Client().get(url)
+        self.assertNotContains(
+            response, f'Пользователь: {self.author.username}')
+
+
+class QueryCountViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.create_posts(1)[0]
+
+    @classmethod
+    def create_posts(cls, count):
+        return [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+            for number in range(count)
+        ]
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def count_queries(self, url):
         cache.clear()
-        response_cache_clear = self.post_author.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(response_add,
-                            response_cache_clear)
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ]
+        single = {url: self.count_queries(url) for url in urls}
+        self.create_posts(9)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        """Число запросов post_detail не зависит от числа комментариев"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        Comment.objects.create(post=self.post, author=self.reader, text='1')
+        single = self.count_queries(url)
+        for number in range(5):
+            Comment.objects.create(
+                post=self.post, author=self.author, text=str(number))
+        self.assertEqual(self.count_queries(url), single)
+
+
+class ConditionalGetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def assert_changed(self, etags):
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_skips_rendering(self):
+        """Совпавший валидатор даёт 304 без рендеринга шаблона"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertIn('Last-Modified', response)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                response = self.reader_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_validators_depend_on_user(self):
+        """Другой пользователь не получает 304 по чужому ETag"""
+        url = reverse('posts:index')
+        etag = self.reader_client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_and_comment_change_validators(self):
+        """Правка поста и новый комментарий меняют валидаторы"""
+        etags = {url: self.reader_client.get(url)['ETag'] for url in self.urls}
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assert_changed(etags)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.reader_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader, text='Ок')
+        self.assert_changed({url: etag})
+
+    def assert_not_modified(self, etags):
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_delete_and_unfollow_change_validators(self):
+        """Удаление поста и отписка меняют валидаторы"""
+        old_post = Post.objects.create(
+            text='Старый', author=self.author, group=self.group)
+        urls = [url for url in self.urls if str(self.post.pk) not in url]
+        etags = {url: self.reader_client.get(url)['ETag'] for url in urls}
+        old_post.delete()
+        self.assert_changed(etags)
+        url = reverse('posts:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        self.assert_changed({url: etag})
+
+    def test_marks_are_scoped(self):
+        """Подписка и удаление меняют валидаторы только своих страниц"""
+        other = User.objects.create_user(username='other')
+        stranger = User.objects.create_user(username='stranger')
+        etags = {url: self.reader_client.get(url)['ETag'] for url in self.urls}
+        Follow.objects.create(user=other, author=stranger)
+        Comment.objects.create(
+            post=self.post, author=other, text='Ок').delete()
+        self.assert_not_modified({
+            url: etag for url, etag in etags.items()
+            if str(self.post.pk) not in url
+        })
+        profile = reverse('posts:profile', kwargs={'username': self.author})
+        follow = reverse('posts:follow_index')
+        etags = {url: self.reader_client.get(url)['ETag']
+                 for url in (profile, follow)}
+        Follow.objects.create(user=other, author=self.author)
+        self.assert_changed(etags)
+
+
+@override_settings(COMMENTS_FIRST_PAGE=2, COMMENTS_PAGE_SIZE=3)
+class CommentsPaginationViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(6)
+        ]
+        cls.comments.reverse()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:2])
+        self.assertContains(response, page.paginator.next_cursor)
+
+    def test_comments_fragment(self):
+        """Следующие страницы отдаются фрагментом по курсору"""
+        detail = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        cursor = detail.context['comments'].paginator.next_cursor
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'includes/comments_page.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[2:5])
+        response = self.client.get(
+            url, {'cursor': page.paginator.next_cursor})
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[5:])
+        self.assertIsNone(response.context['comments'].paginator.next_cursor)
+
+    def test_comments_page_without_js(self):
+        """Без JS следующая страница открывается на странице поста"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        cursor = self.client.get(url).context['comments'].paginator.next_cursor
+        response = self.client.get(url, {'comments': cursor})
+        self.assertEqual(
+            list(response.context['comments']), self.comments[2:5])
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста — 404"""
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
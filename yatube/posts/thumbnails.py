@@ -0,0 +1,133 @@
+"""
+Фоновая нарезка превью картинок постов.
+
+Для каждой картинки заранее готовится набор ширин в WebP и JPEG
+(запасной формат для старых браузеров), а адреса вариантов кладутся
+в кэш. Пока превью нет, шаблоны показывают заглушку того же размера
+и ставят нарезку в очередь, так что страница никогда не ждёт обработки
+картинки и ничего не перекодирует на лету.
+"""
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics, tasks
+from . import conditional
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+WIDTH, HEIGHT = 960, 339
+VARIANT_WIDTHS = (320, 640, 960)
+FORMATS = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+FALLBACK_FORMAT = 'JPEG'
+OPTIONS = {'crop': 'center', 'upscale': True, 'quality': 80}
+SIZES = f'(max-width: {WIDTH}px) 100vw, {WIDTH}px'
+PLACEHOLDER = (
+    'data:image/svg+xml,'
+    '%3Csvg xmlns=%22http://www.w3.org/2000/svg%22 '
+    'width=%22960%22 height=%22339%22%3E'
+    '%3Crect width=%22100%25%22 height=%22100%25%22 fill=%22%23e9ecef%22/%3E'
+    '%3C/svg%3E'
+)
+PENDING_TIMEOUT = 60
+
+
+def _key(name, prefix='image-variants'):
+    digest = hashlib.md5(
+        f'{name}:{VARIANT_WIDTHS}:{sorted(FORMATS)}'.encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+class ImageVariants:
+    """Готовые варианты картинки для <picture> с srcset."""
+
+    def __init__(self, variants=None):
+        # variants: {'WEBP': [(ширина, адрес), ...], 'JPEG': [...]}
+        self.variants = variants or {}
+        self.ready = bool(self.variants)
+        self.sizes = SIZES
+        self.width = WIDTH
+        self.height = HEIGHT
+
+    @property
+    def src(self):
+        if not self.ready:
+            return PLACEHOLDER
+        return self.variants[FALLBACK_FORMAT][-1][1]
+
+    @property
+    def sources(self):
+        """(MIME-тип, srcset) для всех форматов, кроме запасного."""
+        return [
+            (FORMATS[format_], self.srcset(format_))
+            for format_ in FORMATS
+            if format_ != FALLBACK_FORMAT and format_ in self.variants
+        ]
+
+    @property
+    def fallback_srcset(self):
+        return self.srcset(FALLBACK_FORMAT)
+
+    def srcset(self, format_):
+        return ', '.join(
+            f'{url} {width}w' for width, url in self.variants.get(format_, ())
+        )
+
+
+@tasks.task(retries=2)
+def generate(name):
+    """
+    Нарезает превью и запоминает его адрес; вызывается в фоне. Ошибка
+    уходит в очередь задач, и та повторит нарезку.
+    """
+    started = time.monotonic()
+    try:
+        variants = {}
+        for format_ in FORMATS:
+            variants[format_] = []
+            for width in VARIANT_WIDTHS:
+                height = round(width * HEIGHT / WIDTH)
+                thumbnail = get_thumbnail(
+                    name, f'{width}x{height}', format=format_, **OPTIONS)
+                variants[format_].append((width, thumbnail.url))
+    except Exception:
+        logger.warning('Не удалось нарезать превью %s', name)
+        metrics.incr('thumbnails_failed')
+        raise
+    finally:
+        metrics.incr('thumbnail_seconds', time.monotonic() - started)
+    cache.set(_key(name), variants, None)
+    # Страницы с заглушкой вместо картинки больше не актуальны.
+    for pk, author_id, group_id in Post.objects.filter(
+            image=name).values_list('pk', 'author_id', 'group_id'):
+        conditional.touch(
+            'index', ('group', group_id), ('author', author_id), ('post', pk))
+    metrics.incr('thumbnails_generated')
+
+
+def schedule(name):
+    """Ставит нарезку в очередь, если она ещё не ждёт своей очереди."""
+    if not name or not cache.add(_key(name, 'thumb-pending'), 1,
+                                 PENDING_TIMEOUT):
+        return
+    generate.delay(name, key=f'thumbnails:{name}')
+
+
+def prepare(name):
+    """Готовит превью заранее, например сразу после сохранения поста."""
+    if name and cache.get(_key(name)) is None:
+        schedule(name)
+
+
+def image_variants(name):
+    """Готовые варианты превью или заглушка, пока превью не нарезано."""
+    variants = cache.get(_key(name))
+    if variants is None:
+        schedule(name)
+        if tasks.is_eager():
+            variants = cache.get(_key(name))
+    return ImageVariants(variants)
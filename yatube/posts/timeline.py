@@ -0,0 +1,146 @@
+from django.conf import settings
+
+from core.paginator import CursorPaginator, keyset_filter
+from . import caches
+from .models import Follow, Post, TimelineEntry, UserStats
+
+ENTRY_FIELDS = [('pub_date', True), ('post_id', True)]
+
+
+def pulled(prefix=''):
+    """
+    Условие на UserStats автора, чьи посты не раскладываются по лентам
+    при публикации, а подмешиваются при чтении: у него слишком много
+    подписчиков. Раздача и чтение проверяют одно и то же живое значение.
+    """
+    return {f'{prefix}followers_count__gt': settings.TIMELINE_FANOUT_LIMIT}
+
+
+def is_pulled(author_id):
+    return UserStats.objects.filter(user_id=author_id, **pulled()).exists()
+
+
+def unpulled_authors(followers_deltas):
+    """
+    Авторы из {id: сдвиг числа подписчиков}, которых этот сдвиг вернул
+    под TIMELINE_FANOUT_LIMIT: их посты снова раздаются по лентам.
+    """
+    lost = {pk: delta for pk, delta in followers_deltas.items() if delta < 0}
+    if not lost:
+        return []
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    counts = UserStats.objects.filter(pk__in=lost).values_list(
+        'pk', 'followers_count')
+    return [
+        pk for pk, count in counts if count <= limit < count - lost[pk]
+    ]
+
+
+def insert_entries(entries, batch_size=None):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=batch_size or settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).order_by().values_list('user_id', flat=True)
+    insert_entries(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_follow(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('pk', 'pub_date')
+    insert_entries(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def backfill_author(author_id):
+    """
+    Раскладывает посты автора по лентам всех подписчиков. Пока автор
+    подмешивался при чтении, его новые посты и новые подписки в ленты
+    не попадали; без этого они пропали бы, когда он вернулся под предел.
+    """
+    if is_pulled(author_id):
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('pk', 'pub_date'))
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('user_id', flat=True)
+    insert_entries(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for user_id in followers.iterator()
+        for pk, pub_date in posts
+    )
+
+
+def drop_follow(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок: диапазон по индексу (user, pub_date, post) в
+    материализованной ленте плюс посты «тяжёлых» авторов, которые
+    читаются напрямую и сливаются по тому же ключу (pub_date, id).
+    posts задаёт, в каком виде читать посты: объектами или values().
+    """
+
+    def __init__(self, user, per_page, posts=None):
+        self.user = user
+        # Объекты постов берутся из кэша, values() — из базы.
+        hydrate = caches.get_posts if posts is None else None
+        if posts is None:
+            posts = Post.objects.all()
+        self.posts = posts
+        self.pulled = list(Follow.objects.filter(
+            user=user, **pulled('author__stats__')
+        ).order_by().values_list('author_id', flat=True))
+        super().__init__(
+            posts.filter(author_id__in=self.pulled),
+            per_page,
+            ordering=('-pub_date', '-id'),
+            hydrate=hydrate,
+        )
+
+    def fetch(self, values, backwards, limit):
+        entries = TimelineEntry.objects.filter(user=self.user)
+        if values is not None:
+            entries = entries.filter(
+                keyset_filter(ENTRY_FIELDS, values, backwards))
+        order = ('pub_date', 'post_id') if backwards else (
+            '-pub_date', '-post_id')
+        page_ids = entries.order_by(*order).values('post_id')[:limit]
+        if self.hydrate is not None:
+            page_posts = self.hydrate(
+                [row['post_id'] for row in page_ids])
+        else:
+            # Порядок восстанавливается сортировкой ниже, поэтому сами
+            # посты читаются по первичному ключу без ORDER BY.
+            page_posts = self.posts.filter(pk__in=page_ids).order_by()
+        posts = {tuple(self.key(post)): post for post in page_posts}
+        if self.pulled:
+            for post in super().fetch(values, backwards, limit):
+                posts.setdefault(tuple(self.key(post)), post)
+        merged = sorted(posts.values(), key=self.key, reverse=not backwards)
+        return merged[:limit]
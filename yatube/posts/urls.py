@@ -5,16 +5,34 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('popular/', views.popular_posts, name='popular'),
     path('group/<slug:slug>/', views.group_post, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments_page,
+        name='comments'
+    ),
     path('create/', views.post_create, name='post_create'),
+    path('search/', views.search, name='search'),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.profile_export, name='profile_export'),
+    path(
+        'notifications/',
+        views.notification_list,
+        name='notifications'
+    ),
+    path(
+        'notifications/read/',
+        views.notifications_read,
+        name='notifications_read'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,69 +1,169 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
 
+from core.db import read_replica
+from core.paginator import CursorPaginator
+from . import caches, export, notifications, popular
+from .conditional import (conditional, follow_modified, group_modified,
+                          index_modified, post_modified, profile_modified)
+from .counters import get_stats
 from .forms import PostForm, CommentForm
-from .models import Comment, Follow, Group, Post, User
+from .fragments import INDEX_PAGE_KEY, POPULAR_PAGE_KEY
+from .models import Comment, Follow, Notification, Post
+from .search import SearchResults
+from .snapshots import SnapshotPaginator
+from .timeline import TimelinePaginator
 
 NUMBER_OF_POSTS: int = 10
+# Связи, которые шаблоны карточек поста читают у каждого поста.
+POST_RELATED = ('author', 'group')
+# Комментарии идут от новых к старым по индексу (post, created, id).
+COMMENTS_ORDERING = ('-created', '-id')
 
 
-def get_paginator(request, posts, NUMBER_OF_POSTS):
-    pag = Paginator(posts, NUMBER_OF_POSTS)
+def get_paginator(request, posts, NUMBER_OF_POSTS,
+                  paginator=CursorPaginator, **options):
     page_number = request.GET.get('page')
-    page_obj = pag.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET.
+        pag = Paginator(posts, NUMBER_OF_POSTS)
+        return pag.get_page(page_number)
+    pag = paginator(posts, NUMBER_OF_POSTS, **options)
+    return pag.get_page(request.GET.get('cursor'))
+
+
+def cached_or_404(obj):
+    """Как get_object_or_404, но для объекта из posts.caches."""
+    if obj is None:
+        raise Http404
+    return obj
+
+
+def get_comments_page(comments, cursor):
+    """Страница комментариев: первая короче, дальше — по курсору."""
+    per_page = (
+        settings.COMMENTS_PAGE_SIZE if cursor
+        else settings.COMMENTS_FIRST_PAGE
+    )
+    pag = CursorPaginator(comments, per_page, ordering=COMMENTS_ORDERING)
+    return pag.get_page(cursor)
 
 
-@cache_page(20)
+@read_replica
+@conditional(index_modified)
 def index(request):
-    posts = Post.objects.select_related('author').all()
+    posts = Post.objects.select_related(*POST_RELATED)
     context = {
-        'page_obj': get_paginator(request, posts, NUMBER_OF_POSTS),
+        'page_obj': get_paginator(
+            request, posts, NUMBER_OF_POSTS,
+            cache_key=INDEX_PAGE_KEY,
+            cache_timeout=settings.INDEX_CACHE_TIMEOUT,
+            hydrate=caches.get_posts,
+        ),
     }
     return render(request, 'posts/index.html', context)
 
 
+@read_replica
+def popular_posts(request):
+    # Порядок по сохранённой оценке: та же выборка по индексу и тот же
+    # кэш первой страницы, что у главной.
+    posts = Post.objects.select_related(*POST_RELATED)
+    context = {
+        'page_obj': get_paginator(
+            request, posts.order_by(*popular.ORDERING), NUMBER_OF_POSTS,
+            ordering=popular.ORDERING,
+            cache_key=POPULAR_PAGE_KEY,
+            cache_timeout=settings.POPULAR_CACHE_TIMEOUT,
+            hydrate=caches.get_posts,
+        ),
+    }
+    return render(request, 'posts/popular.html', context)
+
+
+@read_replica
+@conditional(group_modified)
 def group_post(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = cached_or_404(caches.groups.get_by('slug', slug))
+    posts = group.posts.select_related(*POST_RELATED)
     context = {
         'group': group,
-        'page_obj': get_paginator(request, posts, NUMBER_OF_POSTS),
+        'page_obj': get_paginator(
+            request, posts, NUMBER_OF_POSTS,
+            paginator=SnapshotPaginator, group_id=group.pk,
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@read_replica
+@conditional(profile_modified)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = cached_or_404(caches.users.get_by('username', username))
+    posts = author.posts.select_related(*POST_RELATED)
     following = request.user.is_authenticated and Follow.objects.filter(
         author=author, user=request.user).exists()
-    count_followers = Follow.objects.filter(author__username=username).count()
+    stats = get_stats(author)
     context = {
         'author': author,
-        'page_obj': get_paginator(request, posts, NUMBER_OF_POSTS),
+        'page_obj': get_paginator(
+            request, posts, NUMBER_OF_POSTS, hydrate=caches.get_posts),
         'following': following,
-        'count_followers': count_followers,
+        'count_followers': stats.followers_count,
+        'count_posts': stats.posts_count,
         'user': request.user,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = SearchResults(query, Post.objects.select_related(*POST_RELATED))
+    pag = Paginator(posts, NUMBER_OF_POSTS)
+    context = {
+        'query': query,
+        'page_obj': pag.get_page(request.GET.get('page')),
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_replica
+@conditional(post_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = cached_or_404(caches.get_post(post_id))
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
+    comments = Comment.objects.filter(post=post).select_related('author')
     context = {
         'post': post,
+        'author_stats': get_stats(post.author),
         'form': form,
-        'comments': comments
+        'comments': get_comments_page(comments, request.GET.get('comments'))
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(request, post_id):
+    """Следующая страница комментариев фрагментом для подгрузки."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(comments, request.GET.get('cursor')),
+    }
+    return render(request, 'includes/comments_page.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     is_edit = False
     form = PostForm(request.POST or None,
@@ -81,6 +181,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     is_edit = True
@@ -103,6 +204,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -114,17 +216,55 @@ def add_comment(request, post_id):
         return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
 @login_required
+@conditional(follow_modified)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = {'page_obj': get_paginator(request, posts, NUMBER_OF_POSTS)}
+    pag = TimelinePaginator(request.user, NUMBER_OF_POSTS)
+    context = {'page_obj': pag.get_page(request.GET.get('cursor'))}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+def notification_list(request):
+    items = Notification.objects.filter(
+        recipient=request.user).select_related('actor', 'post')
+    pag = CursorPaginator(items, NUMBER_OF_POSTS, ordering=('-pk',))
+    context = {
+        'page_obj': pag.get_page(request.GET.get('cursor')),
+        'read_id': get_stats(request.user).notifications_read_id,
+    }
+    return render(request, 'posts/notifications.html', context)
+
+
+@login_required
+@require_POST
+def notifications_read(request):
+    notifications.mark_read(request.user)
+    return redirect('posts:notifications')
+
+
+@login_required
+def profile_export(request):
+    """Архив постов, комментариев и подписок текущего пользователя."""
+    if request.GET.get('format') == 'jsonl':
+        content, content_type, suffix = (
+            export.export_jsonl(request.user), 'application/x-ndjson',
+            'jsonl')
+    else:
+        content, content_type, suffix = (
+            export.export_zip(request.user), 'application/zip', 'zip')
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.username}.{suffix}"')
+    return response
+
+
+@login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
+    author = cached_or_404(caches.users.get_by('username', username))
     if user != author:
         Follow.objects.get_or_create(
             user=user,
@@ -134,11 +274,13 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
+    author = cached_or_404(caches.users.get_by('username', username))
     follower = get_object_or_404(
         Follow,
         user=request.user,
-        author__username=username
+        author=author
     )
     follower.delete()
     return redirect('posts:profile', username)
@@ -0,0 +1,10 @@
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from core.asgi import WsgiToAsgi  # noqa: E402
+
+# Запуск: uvicorn yatube.asgi:application
+application = WsgiToAsgi(get_wsgi_application())
@@ -1,8 +1,11 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 SECRET_KEY = '0j+o$vs$ok!hl(z8#5h0vvu-$b9=2w@6)ye1e1v9tewu#(j&4a'
 
 DEBUG = True
@@ -25,10 +28,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +48,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -52,18 +58,85 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки, в которых yatube.asgi выполняет Django: столько же соединений
+# с базой, сколько бы ни было открытых соединений с клиентами.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
 
-DATABASES = {
-    'default': {
+# База: DB_ENGINE=postgres в продакшене (нужен пакет psycopg2), sqlite —
+# на одной машине и в тестах. Соединения живут CONN_MAX_AGE секунд и
+# переиспользуются между запросами одного потока.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # За PgBouncer в режиме transaction соединение с сервером
+            # меняется между транзакциями, и именованные курсоры
+            # iterator() на нём не живут.
+            'DISABLE_SERVER_SIDE_CURSORS': bool(os.getenv('DB_POOLER')),
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # Сколько секунд ждать снятия блокировки записи.
+            'OPTIONS': {'timeout': int(os.getenv('SQLITE_TIMEOUT', 20))},
+        }
+    }
+
+# Реплики только для чтения: DB_REPLICAS — хосты Postgres или файлы
+# SQLite через запятую, с теми же остальными параметрами, что у default.
+# На них уходят чтения представлений с core.db.read_replica. Автор
+# записи REPLICA_STICKY_SECONDS читает только из default.
+REPLICA_DATABASES = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **{'HOST' if DB_ENGINE == 'postgres' else 'NAME': location},
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(alias)
+if TESTING:
+    # Пустая отдельная база: на ней тесты проверяют, куда уходят чтения.
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
     }
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_COOKIE = 'primary'
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# PRAGMA для каждого нового соединения SQLite: WAL пускает читателей
+# параллельно с писателем, NORMAL не делает fsync на каждый коммит.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -108,11 +181,88 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для всех процессов кэш: CACHE_BACKEND=redis|memcached в продакшене,
+# file или db (таблица из createcachetable) на одной машине и в тестах.
+# Для redis нужен пакет django-redis, для memcached — pylibmc.
+CACHE_BACKENDS = {
+    'redis': 'core.cache.backends.RedisCache',
+    'memcached': 'core.cache.backends.PyLibMCCache',
+    'file': 'core.cache.backends.FileBasedCache',
+    'db': 'core.cache.backends.DatabaseCache',
+    'locmem': 'core.cache.backends.LocMemCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+CACHE_LOCATIONS = {
+    # Тесты переносят его во временный каталог, см. core.test_runner.
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'db': 'yatube_cache',
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', CACHE_LOCATIONS.get(CACHE_BACKEND, '')),
+        'KEY_PREFIX': 'yatube',
+        # Увеличение версии разом «сбрасывает» весь кэш при выкладке.
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
+        'TIMEOUT': 300,
     }
 }
+
+# Первая страница главной ленты отдаётся из кэша с защитой от «набега».
+INDEX_CACHE_TIMEOUT = 60
+
+# Ленты групп: последние GROUP_SNAPSHOT_SIZE id постов группы лежат в кэше
+# и правятся при записи, см. posts.snapshots.
+GROUP_SNAPSHOT_SIZE = 200
+GROUP_SNAPSHOT_TIMEOUT = 60 * 10
+# Посты, группы и пользователи по одному, см. core.cache.objects.
+OBJECT_CACHE_TIMEOUT = 60 * 10
+
+# Авторы, у которых подписчиков больше этого числа, не раскладываются
+# по лентам при публикации: их посты подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 1000
+
+# Лента «Популярное», см. posts.popular: пост на POPULAR_HALF_LIFE секунд
+# новее весит как вдвое больший отклик, сто подписчиков автора — как
+# один комментарий. manage.py recompute_popular пересчитывает оценки
+# постов за POPULAR_WINDOW_DAYS дней (быстрее с пакетом numpy).
+POPULAR_HALF_LIFE = 6 * 60 * 60
+POPULAR_FOLLOWER_WEIGHT = 0.01
+POPULAR_WINDOW_DAYS = 7
+POPULAR_CACHE_TIMEOUT = 60
+
+# Фоновые задачи core.tasks (превью, ленты, поисковый индекс): thread —
+# пул потоков процесса, db — очередь в базе для отдельного воркера
+# manage.py run_tasks, eager — сразу в запросе, как в тестах.
+TASKS_BACKEND = 'eager' if TESTING else os.getenv('TASKS_BACKEND', 'thread')
+TASKS_WORKERS = int(os.getenv('TASKS_WORKERS', 2))
+TASKS_BATCH_SIZE = 100
+TASKS_RETRY_DELAY = 10
+
+# Комментарии под постом: первая страница рендерится вместе с постом,
+# остальные подгружаются по курсору фрагментами или через API.
+COMMENTS_FIRST_PAGE = int(os.getenv('COMMENTS_FIRST_PAGE', 20))
+COMMENTS_PAGE_SIZE = int(os.getenv('COMMENTS_PAGE_SIZE', 50))
+
+# Уведомления о подписчиках и комментариях: не чаще одного письма-сводки
+# на пользователя за NOTIFICATIONS_DIGEST_INTERVAL секунд
+# (manage.py send_digests), в письме — последние NOTIFICATIONS_DIGEST_ITEMS.
+NOTIFICATIONS_DIGEST_INTERVAL = int(
+    os.getenv('NOTIFICATIONS_DIGEST_INTERVAL', 60 * 60))
+NOTIFICATIONS_DIGEST_ITEMS = 20
+
+# Метрики запросов: Server-Timing в отладке, /metrics/ для Prometheus и
+# лог запросов дольше SLOW_REQUEST_MS с самыми медленными SQL.
+SERVER_TIMING = DEBUG
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = 5
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
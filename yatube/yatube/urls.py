@@ -3,15 +3,19 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
 
+from core.views import prometheus_metrics
+
 handler403 = 'core.views.csrf_failure'
 handler404 = 'core.views.page_not_found'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('posts.urls', namespace='posts')),
+    path('api/', include('api.urls', namespace='api')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', prometheus_metrics, name='metrics'),
 ]
 
 if settings.DEBUG: